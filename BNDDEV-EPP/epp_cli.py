@@ -9,30 +9,56 @@ import socket
 import struct
 import xml.etree.ElementTree as ET
 import argparse
+import itertools
+import json
+import os
+import queue
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from xml.sax.saxutils import escape
 
 # Configuration par défaut (à adapter selon vos besoins)
 DEFAULT_LOGIN = "e01290"
 DEFAULT_PASSWORD = "4FMPEL66sa"
 DEFAULT_CLID = "e01290"
+DEFAULT_WINDOW = 8  # commandes en vol par session en mode pipeline
+
+# clTRID unique et croissant : préfixe + démarrage du processus + pid + compteur
+_CLTRID_PREFIX = f"CLI-{datetime.now().strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+_cltrid_counter = itertools.count(1)
+_cltrid_lock = threading.Lock()
+DEFAULT_CHECK_BATCH = 20  # noms par <domain:check> ; limite propre à chaque registre (souvent 5 à 50)
+DEFAULT_SESSIONS = 2  # à garder sous la limite de connexions simultanées du registre
+BULK_MAX_ATTEMPTS = 3  # essais par domaine si la session tombe avec la commande en vol
+EPP_NS = "urn:ietf:params:xml:ns:epp-1.0"
+DOMAIN_NS = "urn:ietf:params:xml:ns:domain-1.0"
+_CLTRID_RE = re.compile(r'<clTRID>\s*([^<]*?)\s*</clTRID>')
 
 class EPPClient:
-    def __init__(self, server, port=700, cert_file=None, key_file=None):
+    def __init__(self, server, port=700, cert_file=None, key_file=None, verbose=True):
         self.server = server
         self.port = port
         self.cert_file = cert_file
         self.key_file = key_file
+        self.verbose = verbose  # False: aucun affichage, les réponses sont retournées par execute()
         self.socket = None
         self.connected = False
+        self.greeting = None
+        self.last_response = None
+        self.last_error = None
+        self.last_used = 0.0
 
     def connect(self):
         """Établit la connexion TLS avec le serveur EPP"""
         try:
-            print(f"🔌 Démarrage connexion vers {self.server}:{self.port}...")
+            self._print(f"🔌 Démarrage connexion vers {self.server}:{self.port}...")
             
             # Création du socket SSL avec paramètres identiques à OpenSSL qui fonctionne
-            print("🔧 Configuration du contexte SSL...")
+            self._print("🔧 Configuration du contexte SSL...")
             context = ssl.create_default_context()
             context.check_hostname = False
             context.verify_mode = ssl.CERT_NONE
@@ -45,62 +71,65 @@ class EPPClient:
             context.minimum_version = ssl.TLSVersion.TLSv1_2
             context.maximum_version = ssl.TLSVersion.TLSv1_2
             
-            print("✅ Contexte SSL configuré")
+            self._print("✅ Contexte SSL configuré")
             
             if self.cert_file:
-                print(f"📜 Chargement certificat client: {self.cert_file}")
+                self._print(f"📜 Chargement certificat client: {self.cert_file}")
                 try:
                     context.load_cert_chain(self.cert_file, self.cert_file)
-                    print("✅ Certificat client chargé avec succès")
+                    self._print("✅ Certificat client chargé avec succès")
                 except Exception as cert_err:
-                    print(f"❌ Erreur chargement certificat: {cert_err}")
+                    self.last_error = f"Erreur chargement certificat: {cert_err}"
+                    self._print(f"❌ {self.last_error}")
                     return False
             
             # Création socket TCP
-            print("🌐 Création socket TCP...")
+            self._print("🌐 Création socket TCP...")
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(15)
             
             # Connexion TCP d'abord
-            print(f"� Connexion TCP vers {self.server}:{self.port}...")
+            self._print(f"� Connexion TCP vers {self.server}:{self.port}...")
             sock.connect((self.server, self.port))
-            print("✅ Connexion TCP établie")
+            self._print("✅ Connexion TCP établie")
             
             # Handshake SSL
-            print("🔐 Démarrage handshake SSL/TLS...")
+            self._print("🔐 Démarrage handshake SSL/TLS...")
             self.socket = context.wrap_socket(sock, server_hostname=self.server)
-            print("✅ Handshake SSL/TLS réussi")
+            self._print("✅ Handshake SSL/TLS réussi")
             
             # Affichage infos SSL (comme OpenSSL)
             cipher = self.socket.cipher()
             if cipher:
-                print(f"🔒 Cipher utilisé: {cipher[0]}")
-                print(f"📋 Protocole: {cipher[1]}")
-                print(f"🔑 Bits: {cipher[2]}")
+                self._print(f"🔒 Cipher utilisé: {cipher[0]}")
+                self._print(f"📋 Protocole: {cipher[1]}")
+                self._print(f"🔑 Bits: {cipher[2]}")
             
-            print("📡 Attente du greeting EPP...")
+            self._print("📡 Attente du greeting EPP...")
             
             # Lire le greeting EPP
-            print("✅ Connexion SSL établie avec succès!")
-            greeting = self._read_epp_message()
-            print("\n" + "="*60)
-            print("📩 GREETING EPP REÇU:")
-            print("-" * 60)
+            self._print("✅ Connexion SSL établie avec succès!")
+            greeting = self.greeting = self._read_epp_message()
+            self.last_used = time.monotonic()
+            self._print("\n" + "="*60)
+            self._print("📩 GREETING EPP REÇU:")
+            self._print("-" * 60)
             self._print_xml_formatted(greeting)
-            print("-" * 60)
+            self._print("-" * 60)
             
             self.connected = True
-            print("🎉 Connexion EPP complète!")
+            self._print("🎉 Connexion EPP complète!")
             return True
             
         except Exception as e:
-            print(f"❌ Erreur de connexion: {e}")
+            self.last_error = f"Erreur de connexion: {e}"
+            self._print(f"❌ {self.last_error}")
             return False
 
     def login(self, login=None, password=None, clid=None):
         """Effectue l'authentification EPP"""
         if not self.connected:
-            print("❌ Pas de connexion établie")
+            self._print("❌ Pas de connexion établie")
             return False
             
         login = login or DEFAULT_LOGIN
@@ -127,13 +156,20 @@ class EPPClient:
   </command>
 </epp>"""
         
-        print("🔐 Authentification en cours...")
-        return self._send_command(login_xml)
+        self._print("🔐 Authentification en cours...")
+        if not self._send_command(login_xml):
+            return False
+        code, message = self.result(self.last_response)
+        if not code.startswith('1'):
+            self.last_error = f"Authentification refusée - Code {code}: {message}"
+            self._print(f"❌ {self.last_error}")
+            return False
+        return True
 
     def send_custom_command(self, xml_command):
         """Envoie une commande XML personnalisée"""
         if not self.connected:
-            print("❌ Pas de connexion établie")
+            self._print("❌ Pas de connexion établie")
             return False
         
         return self._send_command(xml_command)
@@ -148,18 +184,74 @@ class EPPClient:
 
     def domain_info(self, domain_name):
         """Envoie une commande domain:info EPP"""
-        domain_info_xml = f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+        return self._send_command(self.domain_info_xml(domain_name))
+
+    def domain_info_xml(self, domain_name):
+        """XML d'une commande domain:info (pour execute() / pipeline())"""
+        return f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 <epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
   <command>
     <info>
       <domain:info xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
-        <domain:name>{domain_name}</domain:name>
+        <domain:name>{escape(domain_name)}</domain:name>
       </domain:info>
     </info>
     <clTRID>{self._generate_clTRID()}</clTRID>
   </command>
 </epp>"""
-        return self._send_command(domain_info_xml)
+
+    def domain_check_xml(self, domain_names):
+        """XML d'une commande domain:check portant plusieurs noms"""
+        names_xml = "\n".join(f"        <domain:name>{escape(name)}</domain:name>" for name in domain_names)
+        return f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <command>
+    <check>
+      <domain:check xmlns:domain="urn:ietf:params:xml:ns:domain-1.0">
+{names_xml}
+      </domain:check>
+    </check>
+    <clTRID>{self._generate_clTRID()}</clTRID>
+  </command>
+</epp>"""
+
+    def domain_check(self, domain_names, batch_size=DEFAULT_CHECK_BATCH, window=1):
+        """Disponibilité de domaines, `batch_size` noms par commande domain:check (pipelinées si window > 1).
+
+        Retourne {nom: {"avail": bool, "reason": str ou None}} dans l'ordre des noms reçus ;
+        si le registre refuse une commande (ex: trop de noms pour sa limite), ses noms
+        portent {"avail": None, "error": "Code ...: message"}. Les noms IDN sont envoyés
+        en punycode. Lève une exception si la connexion est perdue.
+        """
+        sent = {name: ascii_domain(name).lower() for name in domain_names}
+        ascii_names = list(dict.fromkeys(sent.values()))
+        batches = {}
+
+        def commands():
+            for start in range(0, len(ascii_names), max(1, batch_size)):
+                batch = ascii_names[start:start + max(1, batch_size)]
+                command = self.domain_check_xml(batch)
+                batches[command] = batch
+                yield command
+
+        results = {}
+        for command, response in self.pipeline(commands(), window):
+            batch = batches.pop(command)
+            code, message = self.result(response)
+            if not code.startswith('1'):
+                for name in batch:
+                    results[name] = {"avail": None, "error": f"Code {code}: {message}"}
+                continue
+            for cd in ET.fromstring(response).iter(f'{{{DOMAIN_NS}}}cd'):
+                name = cd.find(f'{{{DOMAIN_NS}}}name')
+                if name is None or not name.text:
+                    continue
+                results[name.text.strip().lower()] = {
+                    "avail": name.get("avail") in ("1", "true"),
+                    "reason": cd.findtext(f'{{{DOMAIN_NS}}}reason'),
+                }
+        missing = {"avail": None, "error": "Absent de la réponse du registre"}
+        return {name: results.get(ascii_name, missing) for name, ascii_name in sent.items()}
 
     def logout(self):
         """Déconnexion EPP"""
@@ -171,65 +263,136 @@ class EPPClient:
   </command>
 </epp>"""
         
-        print("👋 Déconnexion...")
+        self._print("👋 Déconnexion...")
         result = self._send_command(logout_xml)
         self.disconnect()
         return result
 
+    def execute(self, xml_command):
+        """Envoie une commande EPP et retourne la réponse XML brute (sans affichage).
+
+        Lève une exception si la connexion est perdue ; à utiliser par les scripts
+        qui exploitent eux-mêmes les réponses (epp_daemon.py, traitements en masse).
+        """
+        self._write_epp_message(xml_command)
+        response = self.last_response = self._read_epp_message()
+        self.last_used = time.monotonic()
+        return response
+
+    def pipeline(self, commands, window=DEFAULT_WINDOW):
+        """Envoie les commandes sans attendre chaque réponse, `window` au plus en vol.
+
+        Générateur de couples (commande, réponse XML) dans l'ordre d'arrivée des réponses.
+        Chaque réponse est rattachée à sa commande par le clTRID renvoyé par le serveur ;
+        si le serveur ne le renvoie pas (ou pour hello), elle est attribuée à la plus
+        ancienne commande en vol (les serveurs EPP répondent dans l'ordre d'une session).
+        Le débit n'est plus borné par RTT × commandes mais par RTT × commandes / window ;
+        le serveur doit accepter le pipelining, window=1 revient à execute() en boucle.
+        Lève une exception si la connexion est perdue : les commandes encore en vol n'ont
+        alors pas de résultat connu.
+        """
+        in_flight = OrderedDict()
+        commands = iter(commands)
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max(1, window):
+                command = next(commands, None)
+                if command is None:
+                    exhausted = True
+                    break
+                match = _CLTRID_RE.search(command)
+                key = match.group(1) if match and match.group(1) not in in_flight else object()
+                self._write_epp_message(command)
+                in_flight[key] = command
+            if not in_flight:
+                return
+            response = self.last_response = self._read_epp_message()
+            self.last_used = time.monotonic()
+            match = _CLTRID_RE.search(response)
+            key = match.group(1) if match and match.group(1) in in_flight else next(iter(in_flight))
+            yield in_flight.pop(key), response
+
+    @staticmethod
+    def result(xml_response):
+        """Code et message du premier <result> d'une réponse EPP : (code, message)"""
+        try:
+            root = ET.fromstring(xml_response)
+        except ET.ParseError as e:
+            return "", f"Réponse illisible: {e}"
+        result = root.find('.//{urn:ietf:params:xml:ns:epp-1.0}result')
+        if result is None:
+            return "", "Pas de résultat"
+        msg = result.find('{urn:ietf:params:xml:ns:epp-1.0}msg')
+        return result.get('code', ''), msg.text if msg is not None else "Pas de message"
+
     def disconnect(self):
         """Ferme la connexion"""
         if self.socket:
             self.socket.close()
             self.connected = False
-            print("🔌 Connexion fermée")
+            self._print("🔌 Connexion fermée")
 
     def _send_command(self, xml_command):
         """Envoie une commande EPP et traite la réponse"""
         try:
-            print("\n" + "="*60)
-            print("📤 COMMANDE XML ENVOYÉE:")
-            print("-" * 60)
+            self._print("\n" + "="*60)
+            self._print("📤 COMMANDE XML ENVOYÉE:")
+            self._print("-" * 60)
             self._print_xml_formatted(xml_command)
-            print("-" * 60)
+            self._print("-" * 60)
             
-            # Envoie la commande
-            self._write_epp_message(xml_command)
-            
-            # Lit la réponse
-            response = self._read_epp_message()
-            print("\n📥 RÉPONSE XML REÇUE:")
-            print("-" * 60)
+            # Envoie la commande et lit la réponse
+            response = self.execute(xml_command)
+            self._print("\n📥 RÉPONSE XML REÇUE:")
+            self._print("-" * 60)
             self._print_xml_formatted(response)
-            print("-" * 60)
+            self._print("-" * 60)
             
             # Analyse le code de résultat
             self._analyze_response(response)
-            print("="*60)
+            self._print("="*60)
             
             return True
             
         except Exception as e:
-            print(f"❌ Erreur lors de l'envoi: {e}")
+            self.last_error = f"Erreur lors de l'envoi: {e}"
+            self._print(f"❌ {self.last_error}")
+            return False
+
+    def send_pipelined(self, commands, window=DEFAULT_WINDOW):
+        """Envoie des commandes EPP en pipeline et affiche chaque réponse"""
+        try:
+            for _, response in self.pipeline(commands, window):
+                self._print("\n📥 RÉPONSE XML REÇUE:")
+                self._print("-" * 60)
+                self._print_xml_formatted(response)
+                self._print("-" * 60)
+                self._analyze_response(response)
+                self._print("="*60)
+            return True
+        except Exception as e:
+            self.last_error = f"Erreur lors de l'envoi: {e}"
+            self._print(f"❌ {self.last_error}")
             return False
 
     def _read_epp_message(self):
         """Lit un message EPP (4 octets de longueur + XML)"""
         # Lire la longueur du message (4 octets, big-endian)
-        length_bytes = self.socket.recv(4)
-        if len(length_bytes) != 4:
-            raise Exception("Impossible de lire la longueur du message")
-        
+        length_bytes = self._recv_exact(4)
         length = struct.unpack('>I', length_bytes)[0] - 4
         
         # Lire le message XML
-        xml_data = b''
-        while len(xml_data) < length:
-            chunk = self.socket.recv(length - len(xml_data))
+        return self._recv_exact(length).decode('utf-8')
+
+    def _recv_exact(self, size):
+        """Lit exactement `size` octets (un recv peut en retourner moins)"""
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
             if not chunk:
-                raise Exception("Connexion fermée par le serveur")
-            xml_data += chunk
-        
-        return xml_data.decode('utf-8')
+                raise ConnectionError("Connexion fermée par le serveur")
+            data += chunk
+        return bytes(data)
 
     def _write_epp_message(self, xml_message):
         """Écrit un message EPP (4 octets de longueur + XML)"""
@@ -237,17 +400,22 @@ class EPPClient:
         length = len(xml_bytes) + 4
         length_bytes = struct.pack('>I', length)
         
-        self.socket.send(length_bytes + xml_bytes)
+        self.socket.sendall(length_bytes + xml_bytes)
+
+    def _print(self, *args, **kwargs):
+        """print() sauf en mode silencieux (verbose=False)"""
+        if self.verbose:
+            print(*args, **kwargs)
 
     def _print_xml(self, xml_string):
         """Affiche le XML de façon lisible"""
         try:
             root = ET.fromstring(xml_string)
             # Formatage basique pour l'affichage
-            print("  " + xml_string.replace('\n', '\n  '))
+            self._print("  " + xml_string.replace('\n', '\n  '))
         except:
-            print("  " + xml_string)
-        print()
+            self._print("  " + xml_string)
+        self._print()
 
     def _print_xml_formatted(self, xml_string):
         """Affiche le XML avec formatage amélioré"""
@@ -258,11 +426,11 @@ class EPPClient:
             # Supprimer les lignes vides
             lines = [line for line in formatted.split('\n') if line.strip()]
             for line in lines[1:]:  # Skip la première ligne <?xml ...?>
-                print(line)
+                self._print(line)
         except:
             # Fallback vers affichage simple
-            print(xml_string)
-        print()
+            self._print(xml_string)
+        self._print()
 
     def _analyze_response(self, xml_response):
         """Analyse la réponse EPP et affiche le résultat"""
@@ -284,14 +452,188 @@ class EPPClient:
                 else:
                     status = "❌ ERREUR"
                 
-                print(f"📊 Résultat: {status} - Code {code}: {message}")
+                self._print(f"📊 Résultat: {status} - Code {code}: {message}")
                 
         except Exception as e:
-            print(f"⚠️  Impossible d'analyser la réponse: {e}")
+            self._print(f"⚠️  Impossible d'analyser la réponse: {e}")
 
     def _generate_clTRID(self):
-        """Génère un ID de transaction client"""
-        return f"CLI-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        """Génère un ID de transaction client unique et croissant (plusieurs commandes par seconde, plusieurs threads)"""
+        with _cltrid_lock:
+            return f"{_CLTRID_PREFIX}-{next(_cltrid_counter):06d}"
+
+def read_domain_names(path):
+    """Domaines d'un fichier (un par ligne, '-' = stdin), lignes vides et commentaires (#) ignorés"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def ascii_domain(name):
+    """Forme ASCII (punycode) attendue par le registre pour un nom IDN"""
+    try:
+        return name.encode("idna").decode("ascii")
+    except UnicodeError:
+        return name
+
+
+def parse_domain_info(xml_response):
+    """Réponse domain:info → dict (statuts, contacts, serveurs de noms, dates) ; l'authInfo n'est pas repris"""
+    root = ET.fromstring(xml_response)
+    data = root.find(f'.//{{{DOMAIN_NS}}}infData')
+    if data is None:
+        return {}
+    info = {"status": [], "contacts": {}, "ns": [], "hosts": []}
+    for child in data:
+        tag = child.tag.split('}')[-1]
+        if tag == "status":
+            info["status"].append(child.get("s"))
+        elif tag == "contact":
+            info["contacts"].setdefault(child.get("type"), []).append(child.text)
+        elif tag == "ns":
+            info["ns"] = [(host.findtext(f'{{{DOMAIN_NS}}}hostName') if host.tag.endswith("hostAttr") else host.text)
+                          for host in child]
+        elif tag == "host":
+            info["hosts"].append(child.text)
+        elif tag != "authInfo":
+            info[tag] = child.text
+    return info
+
+
+def print_check_results(results):
+    """Affichage lisible des résultats de domain_check()"""
+    for name, result in results.items():
+        if result["avail"]:
+            print(f"✅ {name} disponible")
+        elif result["avail"] is None:
+            print(f"⚠️  {name} non vérifié ({result['error']})")
+        else:
+            reason = f" ({result['reason']})" if result.get("reason") else ""
+            print(f"❌ {name} indisponible{reason}")
+
+
+def check_domains_file(args, names, output):
+    """domain:check d'une liste de domaines sur une session, résultats en NDJSON"""
+    client = EPPClient(args.server, args.port, args.cert, args.key, verbose=False)
+    if not client.connect() or not client.login(args.login, args.password, args.clid):
+        print(f"❌ {client.last_error}", file=sys.stderr)
+        client.disconnect()
+        return None
+    started = time.perf_counter()
+    names = list(names)
+    try:
+        results = client.domain_check(names, args.check_batch, args.window)
+    except Exception as e:
+        print(f"❌ Erreur lors de la vérification: {e}", file=sys.stderr)
+        client.disconnect()
+        return None
+    client.logout()
+    for name, result in results.items():
+        output.write(json.dumps({"domain": name, **result}, ensure_ascii=False) + "\n")
+    available = sum(1 for result in results.values() if result["avail"])
+    errors = sum(1 for result in results.values() if result["avail"] is None)
+    unique = len({ascii_domain(name).lower() for name in results})
+    commands = -(-unique // max(1, args.check_batch))
+    print(f"{'⚠️ ' if errors else '✅'} {len(results)} domaine(s) vérifié(s) en {commands} commande(s) et {time.perf_counter() - started:.1f}s : "
+          f"{available} disponible(s), {errors} non vérifié(s)", file=sys.stderr)
+    return results
+
+
+def bulk_domain_info(args, names, output):
+    """domain:info en masse : les domaines sont répartis sur args.sessions sessions authentifiées
+    parallèles (pipeline de args.window commandes chacune) et les résultats écrits en NDJSON
+    au fil de l'eau. Une erreur sur un domaine donne une ligne {"domain", "error"} sans
+    interrompre le traitement ; une session perdue est rouverte et ses commandes en vol rejouées.
+    """
+    work = queue.Queue()
+    for name in names:
+        work.put((name, 1))
+    total = work.qsize()
+    lock = threading.Lock()
+    counts = {"ok": 0, "errors": 0}
+
+    def emit(record, failed):
+        with lock:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            counts["errors" if failed else "ok"] += 1
+            done = counts["ok"] + counts["errors"]
+            if done % 100 == 0 or done == total:
+                print(f"⏳ {done}/{total} domaines ({counts['errors']} erreurs)", file=sys.stderr, flush=True)
+
+    def open_session(number):
+        client = EPPClient(args.server, args.port, args.cert, args.key, verbose=False)
+        for attempt in range(BULK_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(2 ** attempt)
+            if client.connect() and client.login(args.login, args.password, args.clid):
+                return client
+            client.disconnect()
+            print(f"⚠️  Session {number}: {client.last_error}", file=sys.stderr, flush=True)
+        return None
+
+    def worker(number):
+        client = open_session(number)
+        if client is None:
+            return
+        pending = {}
+
+        def commands():
+            while True:
+                try:
+                    name, attempt = work.get_nowait()
+                except queue.Empty:
+                    return
+                command = client.domain_info_xml(ascii_domain(name))
+                pending[command] = (name, attempt)
+                yield command
+
+        while True:
+            try:
+                for command, response in client.pipeline(commands(), args.window):
+                    name, _ = pending.pop(command)
+                    code, message = client.result(response)
+                    if code.startswith('1'):
+                        emit({"domain": name, **parse_domain_info(response)}, False)
+                    else:
+                        emit({"domain": name, "error": {"code": code, "msg": message}}, True)
+                client.logout()
+                return
+            except Exception as e:
+                print(f"🔄 Session {number} perdue ({e}), {len(pending)} commande(s) en vol rejouée(s)", file=sys.stderr, flush=True)
+                for name, attempt in pending.values():
+                    if attempt < BULK_MAX_ATTEMPTS:
+                        work.put((name, attempt + 1))
+                    else:
+                        emit({"domain": name, "error": {"code": "", "msg": f"Session perdue: {e}"}}, True)
+                pending.clear()
+                client.disconnect()
+                client = open_session(number)
+                if client is None:
+                    return
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(1, args.sessions + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Domaines restants si toutes les sessions sont tombées
+    while not work.empty():
+        name, _ = work.get_nowait()
+        emit({"domain": name, "error": {"code": "", "msg": "Aucune session EPP disponible"}}, True)
+    elapsed = time.perf_counter() - started
+    print(f"{'⚠️ ' if counts['errors'] else '✅'} {counts['ok']} domaine(s) OK, {counts['errors']} en erreur en {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.1f} domaines/s, {args.sessions} session(s) × {args.window} en vol)",
+          file=sys.stderr, flush=True)
+    return counts
+
 
 def main():
     parser = argparse.ArgumentParser(description="CLI EPP minimal")
@@ -302,10 +644,42 @@ def main():
     parser.add_argument("--login", help="Login EPP (sinon utilise la constante)")
     parser.add_argument("--password", help="Mot de passe EPP (sinon utilise la constante)")
     parser.add_argument("--clid", help="Client ID EPP (sinon utilise la constante)")
-    parser.add_argument("--domain", help="Domaine pour commande domain:info")
+    parser.add_argument("--domain", nargs="+", help="Domaine(s) pour commande domain:info")
+    parser.add_argument("--window", type=int, default=1,
+                        help=f"Commandes domain:info envoyées sans attendre la réponse (pipeline, ex: {DEFAULT_WINDOW} ; défaut: 1)")
+    parser.add_argument("--bulk-info", metavar="FICHIER",
+                        help="domain:info en masse : un domaine par ligne ('-' = stdin), résultats en NDJSON")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS,
+                        help=f"Sessions parallèles de --bulk-info, dans la limite de connexions du registre (défaut: {DEFAULT_SESSIONS})")
+    parser.add_argument("--check", nargs="+", metavar="DOMAINE", help="Disponibilité de domaine(s) (domain:check)")
+    parser.add_argument("--check-file", metavar="FICHIER",
+                        help="domain:check d'une liste de domaines (un par ligne, '-' = stdin), résultats en NDJSON")
+    parser.add_argument("--check-batch", type=int, default=DEFAULT_CHECK_BATCH,
+                        help=f"Noms par commande domain:check, selon la limite du registre (défaut: {DEFAULT_CHECK_BATCH})")
+    parser.add_argument("--output", help="Fichier NDJSON de --bulk-info / --check-file (défaut: stdout)")
     
     args = parser.parse_args()
     
+    if args.bulk_info:
+        if args.sessions < 1:
+            parser.error("--sessions doit être >= 1")
+        output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            counts = bulk_domain_info(args, read_domain_names(args.bulk_info), output)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        sys.exit(1 if counts["errors"] else 0)
+    
+    if args.check_file:
+        output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            results = check_domains_file(args, read_domain_names(args.check_file), output)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        sys.exit(0 if results is not None and all(result["avail"] is not None for result in results.values()) else 1)
+    
     # Création du client EPP
     client = EPPClient(args.server, args.port, args.cert, args.key)
     
@@ -320,14 +694,30 @@ def main():
         
         # Si un domaine est spécifié, faire domain:info et sortir
         if args.domain:
-            print(f"\n🔍 Requête domain:info pour: {args.domain}")
-            client.domain_info(args.domain)
+            if args.window > 1 and len(args.domain) > 1:
+                print(f"\n🔍 Requêtes domain:info pipelinées ({args.window} en vol) pour {len(args.domain)} domaines")
+                client.send_pipelined([client.domain_info_xml(domain_name) for domain_name in args.domain], args.window)
+            else:
+                for domain_name in args.domain:
+                    print(f"\n🔍 Requête domain:info pour: {domain_name}")
+                    client.domain_info(domain_name)
+            client.logout()
+            return
+        
+        # Vérification de disponibilité puis sortie
+        if args.check:
+            print(f"\n🔍 Requête domain:check pour {len(args.check)} domaine(s)")
+            try:
+                print_check_results(client.domain_check(args.check, args.check_batch, args.window))
+            except Exception as e:
+                print(f"❌ Erreur lors de la vérification: {e}")
             client.logout()
             return
         
         print("\n🎉 Connexion EPP établie ! Commandes disponibles:")
         print("  'hello' - Envoie une commande hello")
         print("  'domain:info <domaine>' - Informations sur un domaine")
+        print("  'domain:check <domaine> [<domaine> ...]' - Disponibilité de domaines")
         print("  'logout' - Se déconnecter")
         print("  'xml:<votre_xml>' - Envoie du XML personnalisé")
         print("  'quit' - Quitter sans logout")
@@ -351,13 +741,22 @@ def main():
                         client.domain_info(domain_name)
                     else:
                         print("❌ Veuillez spécifier un nom de domaine")
+                elif cmd.startswith('domain:check '):
+                    domain_names = cmd[13:].split()
+                    if domain_names:
+                        try:
+                            print_check_results(client.domain_check(domain_names, args.check_batch))
+                        except Exception as e:
+                            print(f"❌ Erreur lors de la vérification: {e}")
+                    else:
+                        print("❌ Veuillez spécifier au moins un nom de domaine")
                 elif cmd.startswith('xml:'):
                     custom_xml = cmd[4:].strip()
                     client.send_custom_command(custom_xml)
                 elif cmd == '':
                     continue
                 else:
-                    print("❓ Commande non reconnue. Utilisez 'hello', 'domain:info <domaine>', 'logout', 'xml:<xml>', ou 'quit'")
+                    print("❓ Commande non reconnue. Utilisez 'hello', 'domain:info <domaine>', 'domain:check <domaines>', 'logout', 'xml:<xml>', ou 'quit'")
                     
             except KeyboardInterrupt:
                 print("\n🛑 Interruption clavier")
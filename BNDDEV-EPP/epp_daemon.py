@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+EPP Daemon - Pool de sessions EPP authentifiées, servies sur une socket Unix locale
+
+Le daemon ouvre N sessions (connexion TLS + certificat client + greeting + login) au
+démarrage et les garde ouvertes : un hello est envoyé sur chaque session inactive depuis
+--keepalive secondes, et une session perdue est rouverte automatiquement. Les scripts
+soumettent leurs commandes XML sur la socket Unix avec le même framing que EPP
+(4 octets de longueur big-endian + XML) et reçoivent la réponse du registre : une commande
+ne coûte plus qu'un aller-retour au lieu de connect + handshake TLS + login + logout.
+
+Usage:
+  python epp_daemon.py --server epp.gtld.knet.cn --cert certs/epp.gtld.knet.cn.pem --sessions 4
+  python epp_daemon.py --send domain_info.xml        # Soumet une commande au daemon ('-' = stdin)
+  python epp_daemon.py --send-hello                  # Vérifie que le daemon répond
+
+Depuis Python:
+  from epp_daemon import DaemonClient
+  with DaemonClient() as client:
+      response = client.execute(xml)
+"""
+
+import argparse
+import os
+import queue
+import signal
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from epp_cli import EPPClient
+
+# Répertoire propre à l'utilisateur : $XDG_RUNTIME_DIR, sinon /tmp/epp_daemon-<uid> créé en 700
+FALLBACK_SOCKET_DIR = f"/tmp/epp_daemon-{os.getuid()}"
+DEFAULT_SOCKET = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or FALLBACK_SOCKET_DIR, "epp_daemon.sock")
+DEFAULT_SESSIONS = 2
+DEFAULT_KEEPALIVE = 300  # secondes d'inactivité avant un hello (les registres coupent souvent vers 10 min)
+CHECKOUT_TIMEOUT = 60  # attente maximale d'une session libre
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+EPP_NS = "urn:ietf:params:xml:ns:epp-1.0"
+# Commandes rejouées sans risque sur une nouvelle session si la connexion tombe en cours de route
+# (poll op="ack" ne l'est pas : un ack déjà reçu par le registre échouerait au rejeu)
+IDEMPOTENT_COMMANDS = {"check", "info", "poll:req"}
+# Commandes gérées par le daemon lui-même, refusées aux clients
+RESERVED_COMMANDS = {"login", "logout"}
+
+HELLO_XML = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <hello/>
+</epp>"""
+
+
+def log(msg):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def read_frame(sock):
+    """Lit un message au framing EPP (4 octets de longueur incluse + XML), None en fin de flux"""
+    header = _recv_exact(sock, 4)
+    if header is None:
+        return None
+    length = struct.unpack('>I', header)[0] - 4
+    if not 0 <= length <= MAX_MESSAGE_SIZE:
+        raise ValueError(f"Longueur de message invalide: {length}")
+    return (_recv_exact(sock, length) or b'').decode('utf-8')
+
+
+def write_frame(sock, xml_message):
+    """Écrit un message au framing EPP"""
+    xml_bytes = xml_message.encode('utf-8')
+    sock.sendall(struct.pack('>I', len(xml_bytes) + 4) + xml_bytes)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            if data:
+                raise ConnectionError("Connexion fermée au milieu d'un message")
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def error_response(code, message, cltrid=None):
+    """Réponse EPP générée par le daemon (commande refusée, session perdue...)"""
+    trid = f"\n      <clTRID>{escape(cltrid)}</clTRID>" if cltrid else ""
+    return f"""<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<epp xmlns="urn:ietf:params:xml:ns:epp-1.0">
+  <response>
+    <result code="{code}">
+      <msg>{escape(message)}</msg>
+    </result>
+    <trID>{trid}
+      <svTRID>EPP-DAEMON</svTRID>
+    </trID>
+  </response>
+</epp>"""
+
+
+def command_kind(xml_command):
+    """Nature d'une commande EPP : ('hello', None), ('info', clTRID), ('poll:ack', clTRID)... ;
+    lève ET.ParseError si illisible"""
+    root = ET.fromstring(xml_command)
+    if root.find(f'{{{EPP_NS}}}hello') is not None:
+        return "hello", None
+    command = root.find(f'{{{EPP_NS}}}command')
+    if command is None:
+        return None, None
+    cltrid = command.findtext(f'{{{EPP_NS}}}clTRID')
+    for child in command:
+        tag = child.tag.split('}')[-1]
+        if tag == "poll":
+            return f"poll:{child.get('op')}", cltrid
+        if tag not in ("clTRID", "extension"):
+            return tag, cltrid
+    return None, cltrid
+
+
+class SessionPool:
+    """N sessions EPPClient connectées et authentifiées, prêtées une commande à la fois"""
+
+    def __init__(self, server, port, cert_file, key_file, credentials, size=DEFAULT_SESSIONS, keepalive=DEFAULT_KEEPALIVE):
+        self.server = server
+        self.port = port
+        self.cert_file = cert_file
+        self.key_file = key_file
+        self.credentials = credentials  # (login, password, clid)
+        self.size = size
+        self.keepalive = keepalive
+        self.idle = queue.Queue()
+        self.sessions = []
+        self.stats = {"commands": 0, "errors": 0, "reconnects": 0, "keepalives": 0}
+        self._stats_lock = threading.Lock()  # compteurs partagés par les threads clients et le keepalive
+        self._stop = threading.Event()
+
+    def start(self):
+        for number in range(1, self.size + 1):
+            client = EPPClient(self.server, self.port, self.cert_file, self.key_file, verbose=False)
+            client.number = number
+            self._open(client)
+            self.sessions.append(client)
+            self.idle.put(client)
+            log(f"✅ Session {number}/{self.size} authentifiée")
+        threading.Thread(target=self._keepalive_loop, name="keepalive", daemon=True).start()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _open(self, client):
+        if not client.connect():
+            raise ConnectionError(client.last_error)
+        if not client.login(*self.credentials):
+            client.disconnect()
+            raise ConnectionError(client.last_error)
+
+    def _reopen(self, client, reason):
+        """Rouvre une session perdue ; lève ConnectionError si le registre reste injoignable"""
+        log(f"🔄 Session {client.number} perdue ({reason}), reconnexion...")
+        client.disconnect()
+        self._count("reconnects")
+        self._open(client)
+        log(f"✅ Session {client.number} rétablie")
+
+    def execute(self, xml_command):
+        """Exécute une commande sur la première session libre et retourne la réponse XML"""
+        try:
+            kind, cltrid = command_kind(xml_command)
+        except ET.ParseError as e:
+            return error_response(2001, f"Command syntax error: {e}")
+        if kind in RESERVED_COMMANDS:
+            return error_response(2002, f"Command use error: {kind} est géré par le daemon", cltrid)
+
+        try:
+            client = self.idle.get(timeout=CHECKOUT_TIMEOUT)
+        except queue.Empty:
+            return error_response(2400, "Command failed: aucune session libre", cltrid)
+        try:
+            self._count("commands")
+            try:
+                return client.execute(xml_command)
+            except (OSError, ValueError) as e:
+                self._reopen(client, e)
+                if kind == "hello" or kind in IDEMPOTENT_COMMANDS:
+                    return client.execute(xml_command)
+                # La commande a pu être traitée par le registre : au client de vérifier avant de la rejouer
+                return error_response(2400, f"Command failed: session perdue en cours de commande ({e}), résultat inconnu", cltrid)
+        except (OSError, ValueError) as e:
+            self._count("errors")
+            return error_response(2400, f"Command failed: {e}", cltrid)
+        finally:
+            self.idle.put(client)
+
+    def _keepalive_loop(self):
+        while not self._stop.wait(min(self.keepalive, 30)):
+            for _ in range(self.size):
+                try:
+                    client = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if time.monotonic() - client.last_used >= self.keepalive:
+                        try:
+                            client.execute(HELLO_XML)
+                            self._count("keepalives")
+                        except (OSError, ValueError) as e:
+                            self._reopen(client, e)
+                except (OSError, ValueError) as e:
+                    log(f"❌ Session {client.number}: {e}")
+                finally:
+                    self.idle.put(client)
+
+    def close(self):
+        """Logout et fermeture de toutes les sessions"""
+        self._stop.set()
+        for client in self.sessions:
+            try:
+                if client.connected:
+                    client.logout()
+            except OSError:
+                client.disconnect()
+
+
+class DaemonHandler(socketserver.BaseRequestHandler):
+    """Une connexion cliente : suite de commandes, une réponse par commande"""
+
+    def handle(self):
+        while True:
+            try:
+                xml_command = read_frame(self.request)
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                log(f"⚠️  Client ignoré: {e}")
+                return
+            if xml_command is None:
+                return
+            write_frame(self.request, self.server.pool.execute(xml_command))
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, pool):
+        self.pool = pool
+        super().__init__(path, DaemonHandler)
+
+    def server_bind(self):
+        # Les sessions sont authentifiées : la socket est créée d'emblée en 600 (umask),
+        # sans fenêtre entre bind() et chmod() où un autre utilisateur pourrait s'y connecter
+        previous = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(previous)
+        os.chmod(self.server_address, 0o600)
+
+
+class DaemonClient:
+    """Client de la socket du daemon ; execute() a la même forme que EPPClient.execute()"""
+
+    def __init__(self, path=DEFAULT_SOCKET, timeout=CHECKOUT_TIMEOUT + 30):
+        self.path = path
+        self.timeout = timeout
+        self.socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, xml_command):
+        if self.socket is None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(self.timeout)
+            self.socket.connect(self.path)
+        write_frame(self.socket, xml_command)
+        response = read_frame(self.socket)
+        if response is None:
+            raise ConnectionError("Connexion fermée par le daemon")
+        return response
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+
+def _prepare_socket_dir(path):
+    """Crée le répertoire de la socket en 700 s'il manque ; le répertoire de repli dans /tmp
+    doit appartenir à l'utilisateur et n'être accessible qu'à lui"""
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory, mode=0o700)
+    if directory == FALLBACK_SOCKET_DIR:
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise PermissionError(f"{directory} n'est pas un répertoire privé (700) de l'utilisateur courant")
+
+
+def _claim_socket(path):
+    """Supprime une socket orpheline (connexion refusée) ; refuse de démarrer si un daemon
+    écoute déjà. Tout autre cas (fichier qui n'est pas une socket, droits...) lève OSError."""
+    try:
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            raise FileExistsError(f"{path} existe et n'est pas une socket")
+    except FileNotFoundError:
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return False
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return True
+    finally:
+        probe.close()
+
+
+def serve(args):
+    try:
+        _prepare_socket_dir(args.socket)
+        claimed = _claim_socket(args.socket)
+    except OSError as e:
+        print(f"❌ Socket {args.socket} inutilisable : {e}")
+        sys.exit(1)
+    if not claimed:
+        print(f"❌ Un daemon écoute déjà sur {args.socket}")
+        sys.exit(1)
+
+    pool = SessionPool(args.server, args.port, args.cert, args.key, (args.login, args.password, args.clid),
+                       size=args.sessions, keepalive=args.keepalive)
+    log(f"🔌 Ouverture de {args.sessions} session(s) vers {args.server}:{args.port}...")
+    try:
+        pool.start()
+    except ConnectionError as e:
+        print(f"❌ {e}")
+        pool.close()
+        sys.exit(1)
+
+    server = DaemonServer(args.socket, pool)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    log(f"🚀 Daemon EPP en écoute sur {args.socket} ({args.sessions} session(s), keepalive {args.keepalive}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        log("👋 Arrêt du daemon, déconnexion des sessions...")
+        server.server_close()
+        pool.close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        log(f"📊 {pool.stats['commands']} commande(s), {pool.stats['errors']} erreur(s), "
+            f"{pool.stats['reconnects']} reconnexion(s), {pool.stats['keepalives']} keepalive(s)")
+
+
+def send(args):
+    if args.send_hello:
+        xml_command = HELLO_XML
+    elif args.send == "-":
+        xml_command = sys.stdin.read()
+    else:
+        with open(args.send, encoding="utf-8") as f:
+            xml_command = f.read()
+    try:
+        with DaemonClient(args.socket) as client:
+            started = time.perf_counter()
+            response = client.execute(xml_command)
+    except OSError as e:
+        print(f"❌ Daemon injoignable sur {args.socket}: {e}")
+        sys.exit(1)
+    print(response)
+    code, message = EPPClient.result(response)
+    print(f"📊 Code {code or '-'}: {message} ({(time.perf_counter() - started) * 1000:.0f} ms)", file=sys.stderr)
+    if code and not code.startswith('1'):
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daemon EPP : pool de sessions authentifiées sur socket Unix")
+    parser.add_argument("--server", help="Serveur EPP (ex: epp.gtld.knet.cn)")
+    parser.add_argument("--port", type=int, default=700, help="Port EPP (défaut: 700)")
+    parser.add_argument("--cert", help="Fichier certificat client (.pem)")
+    parser.add_argument("--key", help="Fichier clé privée (.key)")
+    parser.add_argument("--login", help="Login EPP (sinon utilise la constante)")
+    parser.add_argument("--password", help="Mot de passe EPP (sinon utilise la constante)")
+    parser.add_argument("--clid", help="Client ID EPP (sinon utilise la constante)")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS,
+                        help=f"Sessions ouvertes en parallèle, dans la limite de connexions du registre (défaut: {DEFAULT_SESSIONS})")
+    parser.add_argument("--keepalive", type=int, default=DEFAULT_KEEPALIVE,
+                        help=f"Hello envoyé après N secondes d'inactivité d'une session (défaut: {DEFAULT_KEEPALIVE})")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Socket Unix du daemon (défaut: {DEFAULT_SOCKET})")
+    parser.add_argument("--send", metavar="FICHIER", help="Soumettre une commande XML au daemon et afficher la réponse ('-' = stdin)")
+    parser.add_argument("--send-hello", action="store_true", help="Soumettre un hello au daemon")
+
+    args = parser.parse_args()
+
+    if args.send or args.send_hello:
+        send(args)
+    elif args.server:
+        if args.sessions < 1:
+            parser.error("--sessions doit être >= 1")
+        serve(args)
+    else:
+        parser.error("--server requis pour démarrer le daemon (ou --send / --send-hello pour l'interroger)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de l'aplatissement des nodes monitorings
+
+Compare flatten() (récursif, générique) et flatten_node() (compilé par __typename)
+sur des nodes synthétiques ayant les formes des fragments de MONITORINGS_QUERY.
+
+Usage: python benchmarks/bench_flatten.py [--nodes 100000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("BRANDSHELTER_TOKEN", "bench")
+
+import bs_graphql_cli as cli
+
+SHAPES = {
+    "LogoMonitoring": {"active": True, "domainNameMonitoringFolder": "Folder"},
+    "ContentMonitoring": {"active": False, "domainNameMonitoringFolder": "Folder"},
+    "DomainAudit": {"active": True, "domainNameMonitoringFolder": None},
+    "DomainMonitoring": {"active": True, "domainNameMonitoringFolder": "Folder"},
+    "SocialMediaMonitoring": {"active": True, "domainNameMonitoringFolder": "Folder"},
+    "WebPageAndWhoisMonitoring": {"active": True, "target": "example.com"},
+    "RegistrantSearch": {"active": True},
+    "Analysis": {"active": False},
+    "Consultation": {"active": True},
+}
+
+
+def make_nodes(count):
+    typenames = list(SHAPES)
+    nodes = []
+    for i in range(count):
+        typename = typenames[i % len(typenames)]
+        node = {"id": str(i), "__typename": typename, "referenceNumber": f"REF-{i:08d}", "createdAt": "2025-07-02T10:00:00Z"}
+        node.update(SHAPES[typename])
+        nodes.append(node)
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flatten() vs flatten_node()")
+    parser.add_argument("--nodes", type=int, default=100000, help="Nombre de nodes synthétiques (défaut: 100000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de mesures, la meilleure est retenue (défaut: 5)")
+    args = parser.parse_args()
+
+    nodes = make_nodes(args.nodes)
+    assert [cli.flatten(n) for n in nodes[:50]] == [cli.flatten_node(n) for n in nodes[:50]]
+
+    results = {}
+    for name, func in (("flatten", cli.flatten), ("flatten_node", cli.flatten_node)):
+        best = min(timeit.repeat(lambda: [func(n) for n in nodes], number=1, repeat=args.repeat))
+        results[name] = best
+        print(f"{name:<14} {best * 1e9 / args.nodes:8.0f} ns/node   {args.nodes / best:12,.0f} nodes/s")
+    print(f"gain: x{results['flatten'] / results['flatten_node']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la pagination et des lookups contre le serveur GraphQL local (bs_mock_server.py)
+
+Démarre le serveur de test dans le processus, pointe bs_graphql_cli dessus (configure_endpoint)
+et mesure pour chaque scénario : pages/s, nodes/s (ou lookups/s), temps passé à attendre le
+rate limiter (RateLimiter.waited) et dans les reprises (RetryPolicy.slept), cumulés sur
+tous les threads, et 429 reçus.
+
+Scénarios : pages séquentielles (requête complète), projection --fields, export par fenêtres
+(--shards), lookups unitaires et groupés par alias. Chaque scénario repart d'un budget plein.
+
+Usage: python benchmarks/bench_pagination.py [--nodes 5000] [--latency 20] [--budget 100000]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("BRANDSHELTER_TOKEN", "bench")
+
+import bs_graphql_cli as cli
+import bs_mock_server as mock
+
+CREATED_AT_GT = "2024-12-31T00:00:00Z"
+
+
+def pages_sequential(args, fields=None):
+    pages = nodes = 0
+    for page, _ in cli.iter_monitoring_pages(createdAtGt=CREATED_AT_GT, limit=args.limit, fields=fields):
+        pages += 1
+        nodes += len(page)
+    return pages, nodes
+
+
+def pages_sharded(args):
+    end = cli._format_iso(mock.NODES_START + mock.NODES_STEP * args.nodes)
+    pages = nodes = 0
+    for page in cli.iter_monitorings_sharded(createdAtGt=CREATED_AT_GT, createdAtLt=end, shards=args.shards,
+                                             concurrency=args.concurrency, limit=args.limit):
+        pages += 1
+        nodes += len(page)
+    return pages, nodes
+
+
+def lookups(args, batch_size):
+    pairs = [("domainName", f"domaine-{i}.example") for i in range(args.lookups)]
+    before = server.state.stats["requests"]
+    total, _ = cli.query_custom_bulk(pairs, concurrency=args.concurrency, batch_size=batch_size, out=io.StringIO())
+    return server.state.stats["requests"] - before, total
+
+
+def run(name, func, unit="nodes"):
+    limiter = cli.configure_rate_limiter(path=None, budget=args.client_budget)
+    policy = cli.configure_retries(max_retries=args.retries)
+    server.state.tokens = float(server.state.capacity)
+    throttled = server.state.stats["throttled"]
+    started = time.perf_counter()
+    pages, items = func()
+    elapsed = time.perf_counter() - started
+    print(f"{name:<26} {pages:6d} req  {items:7d} {unit:<7} {elapsed:7.2f}s  {pages / elapsed:8.1f} req/s  "
+          f"{items / elapsed:9.0f} {unit}/s  rate limiter {limiter.waited:6.2f}s  reprises {policy.retries:3d} "
+          f"({policy.slept:5.2f}s)  429 {server.state.stats['throttled'] - throttled}")
+
+
+def main():
+    global args, server
+    parser = argparse.ArgumentParser(description="Benchmark pagination/lookups contre bs_mock_server")
+    parser.add_argument("--nodes", type=int, default=5000, help="Nombre de monitorings servis (défaut: 5000)")
+    parser.add_argument("--limit", type=int, help="Nombre maximum de monitorings par scénario")
+    parser.add_argument("--latency", type=float, default=20.0, help="Latence serveur en ms (défaut: 20)")
+    parser.add_argument("--jitter", type=float, default=5.0, help="Latence aléatoire supplémentaire en ms (défaut: 5)")
+    parser.add_argument("--budget", type=int, default=10 ** 9, help="Budget serveur par minute avant 429 (défaut: illimité)")
+    parser.add_argument("--client-budget", type=int, default=10 ** 9, help="Budget du rate limiter client par minute (défaut: illimité)")
+    parser.add_argument("--retries", type=int, default=cli.MAX_RETRIES, help="Reprises par requête (défaut: %(default)s)")
+    parser.add_argument("--shards", type=int, default=8, help="Fenêtres de l'export parallèle (défaut: 8)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallélisme des fenêtres et lookups (défaut: 8)")
+    parser.add_argument("--lookups", type=int, default=500, help="Nombre de lookups (défaut: 500)")
+    parser.add_argument("--fields", default="referenceNumber", help="Projection du scénario --fields (défaut: referenceNumber)")
+    args = parser.parse_args()
+
+    server, url = mock.start_server(nodes=args.nodes, latency=args.latency / 1000, jitter=args.jitter / 1000, budget=args.budget)
+    cli.configure_endpoint(url)
+    cli.configure_cache(enabled=False)
+    print(f"serveur {url} : {args.nodes} monitorings, latence {args.latency:.0f}+{args.jitter:.0f} ms, budget {args.budget}/min")
+
+    fields = cli.parse_monitoring_fields(args.fields)
+    run(f"pages ({cli.MONITORINGS_PAGE_SIZE}/page)", lambda: pages_sequential(args))
+    run(f"--fields {args.fields}", lambda: pages_sequential(args, fields))
+    run(f"--shards {args.shards}", lambda: pages_sharded(args))
+    run("lookups unitaires", lambda: lookups(args, 1), unit="lookups")
+    run("lookups groupés (alias)", lambda: lookups(args, None), unit="lookups")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
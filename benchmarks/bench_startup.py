@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark du temps de démarrage de bs_graphql_cli (basé sur python -X importtime)
+
+Mesure le temps cumulé d'import du module et le temps total de `--help`, et vérifie
+qu'aucun module lourd (rich, requests, dotenv, orjson) n'est importé au chargement.
+Retourne un code de sortie non nul en cas de régression.
+
+Usage: python benchmarks/bench_startup.py [--runs 10] [--max-import-ms 30]
+"""
+import argparse
+import os
+import py_compile
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MODULE = "bs_graphql_cli"
+HEAVY_MODULES = ("rich", "requests", "dotenv", "orjson")
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile():
+    """Retourne {module: (self_us, cumulative_us)} pour un import de MODULE."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    profile = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            profile[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return profile
+
+
+def help_wall_ms():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, f"{MODULE}.py", "--help"], cwd=ROOT, capture_output=True, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage de bs_graphql_cli")
+    parser.add_argument("--runs", type=int, default=10, help="Nombre de mesures (défaut: 10)")
+    parser.add_argument("--max-import-ms", type=float, default=30.0, help="Seuil de régression du temps d'import cumulé (défaut: 30 ms)")
+    parser.add_argument("--top", type=int, default=10, help="Nombre d'imports les plus coûteux à afficher (défaut: 10)")
+    args = parser.parse_args()
+
+    # Mesure avec le bytecode à jour, comme pour un lancement normal
+    py_compile.compile(os.path.join(ROOT, f"{MODULE}.py"))
+
+    import_ms = []
+    profile = {}
+    for _ in range(args.runs):
+        profile = import_profile()
+        import_ms.append(profile[MODULE][1] / 1000)
+    help_ms = [help_wall_ms() for _ in range(args.runs)]
+
+    print(f"import {MODULE:<16} médiane {statistics.median(import_ms):7.1f} ms  (min {min(import_ms):.1f})")
+    print(f"{MODULE}.py --help   médiane {statistics.median(help_ms):7.1f} ms  (min {min(help_ms):.1f})")
+    print("\nImports les plus coûteux (cumulé, dernière mesure) :")
+    for name, (_, cumulative) in sorted(profile.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative / 1000:7.1f} ms  {name}")
+
+    failures = []
+    heavy = sorted(name for name in profile if name.split(".")[0] in HEAVY_MODULES)
+    if heavy:
+        failures.append(f"modules lourds importés au chargement : {', '.join(heavy)}")
+    if statistics.median(import_ms) > args.max_import_ms:
+        failures.append(f"import {statistics.median(import_ms):.1f} ms > seuil {args.max_import_ms} ms")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Démarrage dans les seuils")
+
+
+if __name__ == "__main__":
+    main()
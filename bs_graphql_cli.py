@@ -1,25 +1,151 @@
 #!/usr/bin/env python3
 
+# Démarrage rapide : requests, rich, dotenv et orjson ne sont importés que par
+# les chemins qui en ont besoin (voir benchmarks/bench_startup.py).
 import os
 import json
-import argparse
-import requests
-from rich.console import Console
-from rich.syntax import Syntax
-from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import re
+import sys
 import time
 
-load_dotenv()  # Charge les variables depuis .env
+# Balises rich ([bold red], [/]) précédées d'éventuels \ d'échappement, comme les reconnaît rich
+_MARKUP_RE = re.compile(r"(\\*)(\[[a-z#/@][^[]*?])")
 
-console = Console()
+
+def escape_markup(value):
+    """Échappe une valeur (donnée API, nom de fichier...) avant de l'insérer dans un texte à balises rich.
+
+    Même règle que rich.markup.escape, sans importer rich : "[test]" reste du texte,
+    en mode rich comme en mode plain.
+    """
+    text = _MARKUP_RE.sub(lambda m: f"{m.group(1)}{m.group(1)}\\{m.group(2)}", str(value))
+    # un \ final échapperait la balise fermante qui suit
+    return text + "\\" if text.endswith("\\") and not text.endswith("\\\\") else text
+
+
+def _strip_markup(text):
+    # Nombre impair de \ : balise échappée, gardée telle quelle ; sinon balise de style, retirée
+    return _MARKUP_RE.sub(lambda m: m.group(1)[:len(m.group(1)) // 2] + (m.group(2) if len(m.group(1)) % 2 else ""), text)
+
+
+class LazyConsole:
+    """Console rich créée au premier affichage ; en mode plain, rich n'est jamais importé.
+
+    Le mode plain retire le balisage ([bold red]…[/]) et écrit le texte brut. Les valeurs
+    insérées dans un texte à balises passent par escape_markup ; un texte sans balises
+    (données brutes) s'affiche avec markup=False.
+    """
+
+    plain = os.getenv("BS_PLAIN", "") not in ("", "0")
+
+    def __init__(self, stderr=False):
+        self.stderr = stderr
+        self._console = None
+
+    def print(self, *objects, **kwargs):
+        if LazyConsole.plain:
+            stream = sys.stderr if self.stderr else sys.stdout
+            markup = kwargs.get("markup", True)
+            print(*(_strip_markup(o) if isinstance(o, str) and markup else o for o in objects), file=stream)
+            return
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(stderr=self.stderr)
+        self._console.print(*objects, **kwargs)
+
+    def print_code(self, code, lexer, line_numbers=False):
+        """Affiche du code (GraphQL, JSON) coloré, ou brut en mode plain."""
+        if LazyConsole.plain:
+            print(code, file=sys.stderr if self.stderr else sys.stdout)
+            return
+        from rich.syntax import Syntax
+        self.print(Syntax(code, lexer, theme="monokai", line_numbers=line_numbers))
+
+
+console = LazyConsole()
+err_console = LazyConsole(stderr=True)
+_env_loaded = False
 DOMAIN_FIELDS = {"domainName", "domainHandle", "nameServer"}
 
 API_URL_PROD = "https://secure.brandshelter.com/graphql"
 API_URL_DEV = "https://app.dev.bs-srv.net/graphql"
+_api_url = None  # --endpoint, ex. serveur de test local (bs_mock_server.py)
+
+# Transport HTTP partagé (keep-alive + pool de connexions)
+POOL_MAXSIZE = 16
+REQUEST_TIMEOUT = 60
+_session = None
+
+# Affichage des réponses : au-delà de cette taille, "auto" n'affiche qu'un résumé
+RENDER_POLICIES = ("auto", "none", "summary", "full")
+RENDER_FULL_MAX_BYTES = 256 * 1024
+
+# --compare : nombre maximum de différences affichées (toutes avec --output)
+COMPARE_MAX_SHOWN = 50
+
+# Mode bulk : nombre de requêtes query_custom exécutées en parallèle
+DEFAULT_CONCURRENCY = 8
+# Export parallèle : nombre de fenêtres de temps par défaut
+SHARD_BUFFER_PAGES = 4  # pages gardées en mémoire par fenêtre en attente de son tour
+DEFAULT_SHARDS = 16
+
+# Regroupement par alias : complexité estimée d'un lookup et budget par requête
+MAX_QUERY_COMPLEXITY = 25000  # ≈ 49 nodes × 500, le plafond utilisé par paginate_monitorings
+LOOKUP_COMPLEXITY = {"domains": 100, "userSafebrands": 500}  # userSafebrands inclut la liste des permissions
+MAX_BATCH_SIZE = 100
+
+# Rate limit : budget de complexité par minute, partagé entre processus via un fichier d'état
+COMPLEXITY_PER_NODE = 500  # estimation initiale basée sur 100 nodes = 50007, affinée par les réponses
+SAFE_COMPLEXITY = 85000
+SECONDS_PER_MIN = 60
+RATE_STATE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "bs_graphql_cli", "ratelimit.json")
+_rate_limiter = None
+
+# Reprises : backoff exponentiel avec jitter, circuit ouvert après une série d'échecs
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_ERROR_CODES = {"THROTTLED", "RATE_LIMITED", "TOO_MANY_REQUESTS"}  # extensions.code d'erreurs GraphQL en 200
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 30.0
+_retry_policy = None
+_circuit_breaker = None
+
+# Automatic persisted queries : hash SHA-256 envoyé à la place du texte des documents connus
+APQ_STATE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "bs_graphql_cli", "apq.json")
+USER_LOOKUP_FIELDS = ("loginName", "login", "clientNumber")
+_apq = None
+
+# Cache local des lookups (SQLite) : durée de vie par type de requête, taille bornée (LRU)
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "bs_graphql_cli", "cache.sqlite")
+CACHE_TTL = {"domains": 24 * 3600, "userSafebrands": 3600}
+CACHE_MAX_ENTRIES = 100000
+_cache = None
+
+# Index domaine → compte (--resolve-domains) : entrées plus anciennes que DOMAIN_INDEX_TTL redemandées à l'API
+DOMAIN_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".cache", "bs_graphql_cli", "domains.sqlite")
+DOMAIN_INDEX_TTL = 7 * 24 * 3600
+RESOLVE_CHUNK = 5000  # domaines lus, dédoublonnés et résolus par tranche
+
+# Métriques par requête (--metrics-out) : histogrammes écrits en JSON ou au format Prometheus
+METRICS_BUCKETS = {
+    "ms": (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+    "bytes": (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    "complexity": (100, 500, 1000, 2500, 5000, 10000, 25000, 50000),
+    "ratio": (0.25, 0.5, 0.8, 0.9, 1.0, 1.1, 1.25, 2.0, 4.0),
+}
+_metrics = None
+_timings = None  # mesures de connexion de la requête en cours, par thread (threading.local)
 
 
 def get_token():
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()  # Charge les variables depuis .env
+        _env_loaded = True
     token = os.getenv("BRANDSHELTER_TOKEN")
     if not token:
         console.print("[bold red]❌ Token JWT manquant. Définis BRANDSHELTER_TOKEN dans .env ou ton environnement.[/]")
@@ -35,7 +161,993 @@ def make_headers():
     }
 
 
-def query_graphql(endpoint, query, verbose=False, variables=None):
+class GraphQLRequestError(Exception):
+    """Échec d'un appel GraphQL (réseau, statut HTTP ou réponse illisible).
+
+    `status` vaut None pour une erreur réseau, `retry_after` reprend l'en-tête Retry-After.
+    """
+
+    def __init__(self, message, response_text="", status=None, retry_after=None):
+        super().__init__(message)
+        self.response_text = response_text
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(GraphQLRequestError):
+    """Appel refusé sans être envoyé : le circuit de l'endpoint est ouvert."""
+
+
+def _parse_retry_after(value):
+    """Retry-After en secondes (entier ou date HTTP), None si absent/illisible."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_complexity(data, headers=None):
+    """Lit la complexité facturée et le budget restant dans une réponse.
+
+    Cherche dans `extensions` (complexity, cost, cost.actualQueryCost,
+    cost.throttleStatus.currentlyAvailable) et dans les en-têtes RateLimit-Remaining.
+    Retourne (complexité, restant), chaque valeur pouvant être None.
+    """
+    reported = remaining = None
+    extensions = (data or {}).get("extensions") or {}
+    for key in ("complexity", "cost"):
+        value = extensions.get(key)
+        if isinstance(value, (int, float)):
+            reported = value
+        elif isinstance(value, dict):
+            reported = value.get("actualQueryCost", value.get("requestedQueryCost", reported))
+            throttle = value.get("throttleStatus") or {}
+            remaining = throttle.get("currentlyAvailable", remaining)
+    for header in ("X-RateLimit-Remaining", "RateLimit-Remaining"):
+        value = (headers or {}).get(header)
+        if value is not None:
+            try:
+                remaining = float(value)
+            except ValueError:
+                pass
+            break
+    return reported, remaining
+
+
+class RateLimiter:
+    """Token bucket de complexité GraphQL, par endpoint, persisté sur disque.
+
+    Le seau contient au plus `capacity` points et se remplit de capacity/period
+    points par seconde. Le coût unitaire de chaque type de requête (par node
+    demandé, par lookup) est appris des complexités renvoyées par l'API ; un 429
+    vide le seau jusqu'à l'échéance du Retry-After. L'état est relu et réécrit
+    sous verrou (flock) à chaque opération, donc plusieurs CLI lancés en même
+    temps consomment le même budget.
+    """
+
+    LEARNING_RATE = 0.3
+
+    def __init__(self, path=RATE_STATE_FILE, capacity=SAFE_COMPLEXITY, period=SECONDS_PER_MIN, verbose=False):
+        import threading
+        self.path = path
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.verbose = verbose
+        self.waited = 0.0  # secondes passées à attendre le budget dans ce processus
+        self._lock = threading.Lock()
+        self._memory_state = {}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _update(self, endpoint, func):
+        """Applique func(état_endpoint, maintenant) sous verrou, retourne son résultat."""
+        with self._lock:
+            handle = None
+            try:
+                if self.path:
+                    handle = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600), "r+", encoding="utf-8")
+                    try:
+                        import fcntl
+                        fcntl.flock(handle, fcntl.LOCK_EX)
+                    except ImportError:
+                        pass  # pas de flock (Windows) : budget partagé entre threads seulement
+                    handle.seek(0)
+                    try:
+                        state = json.loads(handle.read() or "{}")
+                    except ValueError:
+                        state = {}
+                else:
+                    state = self._memory_state
+
+                now = time.time()
+                bucket = state.setdefault(endpoint, {"tokens": self.capacity, "updated": now, "blocked_until": 0, "costs": {}})
+                bucket["tokens"] = min(self.capacity, bucket["tokens"] + (now - bucket["updated"]) * self.rate)
+                bucket["updated"] = now
+                result = func(bucket, now)
+
+                if handle:
+                    handle.seek(0)
+                    handle.truncate()
+                    handle.write(json.dumps(state))
+                    handle.flush()
+                return result
+            finally:
+                if handle:
+                    handle.close()  # libère aussi le flock
+
+    def _read(self, endpoint):
+        """État d'un endpoint en lecture seule (verrou partagé, fichier non réécrit)."""
+        with self._lock:
+            if not self.path:
+                return self._memory_state.get(endpoint) or {}
+            try:
+                with open(self.path, encoding="utf-8") as handle:
+                    try:
+                        import fcntl
+                        fcntl.flock(handle, fcntl.LOCK_SH)
+                    except ImportError:
+                        pass
+                    return json.loads(handle.read() or "{}").get(endpoint) or {}
+            except (FileNotFoundError, ValueError):
+                return {}
+
+    def estimate(self, endpoint, key, units, default_unit_cost):
+        learned = (self._read(endpoint).get("costs") or {}).get(key)
+        return units * (learned if learned is not None else default_unit_cost)
+
+    def acquire(self, endpoint, cost):
+        """Bloque jusqu'à ce que `cost` points soient disponibles et les consomme.
+
+        Un coût supérieur à la capacité passe dès que le seau est plein.
+        Retourne le temps passé à attendre, en secondes.
+        """
+        cost = min(cost, self.capacity)
+        waited = 0.0
+
+        def take(bucket, now):
+            if now < bucket["blocked_until"]:
+                return bucket["blocked_until"] - now
+            if bucket["tokens"] >= cost:
+                bucket["tokens"] -= cost
+                return 0.0
+            return (cost - bucket["tokens"]) / self.rate
+
+        while True:
+            to_wait = self._update(endpoint, take)
+            if to_wait <= 0:
+                return waited
+            if self.verbose:
+                err_console.print(f"[yellow]⏳ Attente {to_wait:.1f}s pour respecter le rate limit...[/]")
+            time.sleep(to_wait)
+            waited += to_wait
+            with self._lock:
+                self.waited += to_wait
+
+    def record(self, endpoint, key, units, charged, reported=None, remaining=None):
+        """Corrige le seau avec la complexité réellement facturée et apprend le coût unitaire.
+
+        `charged` est le coût prélevé par acquire (plafonné à la capacité), pas l'estimation brute.
+        """
+        def learn(bucket, now):
+            if reported is not None:
+                bucket["tokens"] = max(0.0, bucket["tokens"] + charged - reported)
+                if key and units:
+                    unit_cost = reported / units
+                    previous = bucket["costs"].get(key)
+                    bucket["costs"][key] = unit_cost if previous is None else previous + self.LEARNING_RATE * (unit_cost - previous)
+            if remaining is not None:
+                bucket["tokens"] = max(0.0, min(bucket["tokens"], remaining))
+        self._update(endpoint, learn)
+
+    def throttled(self, endpoint, retry_after=None):
+        """Réponse 429 : seau vidé et appels suspendus jusqu'au Retry-After."""
+        delay = retry_after if retry_after is not None else (self.capacity / self.rate) / 4
+
+        def block(bucket, now):
+            bucket["tokens"] = 0.0
+            bucket["blocked_until"] = max(bucket["blocked_until"], now + delay)
+        self._update(endpoint, block)
+
+
+def get_rate_limiter():
+    """Limiteur partagé par le processus (créé au premier appel avec les réglages par défaut)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
+
+
+def configure_rate_limiter(path=RATE_STATE_FILE, budget=SAFE_COMPLEXITY, verbose=False):
+    global _rate_limiter
+    _rate_limiter = RateLimiter(path=path, capacity=budget, verbose=verbose)
+    return _rate_limiter
+
+
+class RetryPolicy:
+    """Politique de reprise des appels GraphQL.
+
+    Sont repris : les erreurs réseau, les statuts de RETRY_STATUSES et les réponses
+    200 dont une erreur porte un extensions.code de RETRY_ERROR_CODES. Le délai suit
+    un backoff exponentiel à jitter complet, jamais inférieur au Retry-After.
+    Les mutations ne sont jamais rejouées.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, base=BACKOFF_BASE, cap=BACKOFF_CAP, verbose=False):
+        import threading
+        self.max_retries = max_retries
+        self.base = base
+        self.cap = cap
+        self.verbose = verbose
+        self.retries = 0  # reprises et secondes d'attente cumulées dans ce processus
+        self.slept = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_idempotent(query):
+        body = re.sub(r"#[^\n]*", "", query).lstrip()
+        return not body.startswith(("mutation", "subscription"))
+
+    @staticmethod
+    def is_retryable(error):
+        return error.status is None or error.status in RETRY_STATUSES
+
+    def delay(self, attempt, retry_after=None):
+        import random
+        backoff = random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+    def sleep(self, delay):
+        with self._lock:
+            self.retries += 1
+            self.slept += delay
+        time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Disjoncteur par endpoint : après `threshold` échecs consécutifs, les appels
+    sont refusés (CircuitOpenError) pendant `cooldown` secondes, puis un seul appel
+    d'essai est laissé passer ; son succès referme le circuit.
+    """
+
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN):
+        import threading
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._opened_at = {}
+        self._probing = set()
+
+    def before_call(self, endpoint):
+        with self._lock:
+            opened_at = self._opened_at.get(endpoint)
+            if opened_at is None:
+                return
+            remaining = opened_at + self.cooldown - time.time()
+            if remaining > 0 or endpoint in self._probing:
+                raise CircuitOpenError(f"circuit ouvert pour {endpoint} ({self._failures[endpoint]} échecs consécutifs), "
+                                       f"nouvel essai dans {max(remaining, 0):.0f}s", retry_after=max(remaining, 0))
+            self._probing.add(endpoint)  # semi-ouvert : un seul appel d'essai
+
+    def record_success(self, endpoint):
+        with self._lock:
+            self._failures.pop(endpoint, None)
+            self._opened_at.pop(endpoint, None)
+            self._probing.discard(endpoint)
+
+    def record_failure(self, endpoint):
+        with self._lock:
+            failures = self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+            if failures >= self.threshold or endpoint in self._probing:
+                self._opened_at[endpoint] = time.time()
+            self._probing.discard(endpoint)
+
+
+def get_retry_policy():
+    global _retry_policy
+    if _retry_policy is None:
+        _retry_policy = RetryPolicy()
+    return _retry_policy
+
+
+def get_circuit_breaker():
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
+
+
+def configure_retries(max_retries=MAX_RETRIES, verbose=False):
+    global _retry_policy
+    _retry_policy = RetryPolicy(max_retries=max_retries, verbose=verbose)
+    return _retry_policy
+
+
+def query_hash(query):
+    import hashlib
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class PersistedQueries:
+    """Automatic persisted queries (protocole APQ, version 1).
+
+    Un document déjà enregistré côté serveur n'est envoyé que sous forme de hash
+    SHA-256 (+ variables). Un document inconnu est envoyé une fois en texte complet
+    avec son hash, ce qui l'enregistre. Les hashes enregistrés sont mémorisés par
+    endpoint dans `path`, pour que les exécutions suivantes partent directement en
+    hash seul ; un PersistedQueryNotFound (cache serveur vidé) fait renvoyer le
+    texte complet. Si le serveur ne supporte pas APQ, l'endpoint repasse en texte.
+    """
+
+    def __init__(self, path=APQ_STATE_FILE):
+        import threading
+        self.path = path
+        self._lock = threading.Lock()
+        self._hashes = {}  # document -> sha256, calculé une fois par document
+        self._unsupported = set()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._registered = {endpoint: set(hashes) for endpoint, hashes in json.load(f).items()}
+        except (FileNotFoundError, ValueError):
+            self._registered = {}
+
+    def hash(self, query):
+        digest = self._hashes.get(query)
+        if digest is None:
+            digest = self._hashes[query] = query_hash(query)
+        return digest
+
+    def payload(self, endpoint, query, variables=None, full=False):
+        """Payload APQ : hash seul si le document est connu du serveur, sinon texte + hash."""
+        if endpoint in self._unsupported:
+            payload = {"query": query}
+        else:
+            payload = {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": self.hash(query)}}}
+            if full or self.hash(query) not in self._registered.get(endpoint, ()):
+                payload["query"] = query
+        if variables:
+            payload["variables"] = variables
+        return payload
+
+    @staticmethod
+    def _error_codes(data):
+        return {(error.get("message") or "") for error in data.get("errors") or []} | \
+            {((error.get("extensions") or {}).get("code") or "") for error in data.get("errors") or []}
+
+    def is_miss(self, data):
+        return bool(self._error_codes(data) & {"PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND"})
+
+    def is_unsupported(self, data):
+        return bool(self._error_codes(data) & {"PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED"})
+
+    def disable(self, endpoint):
+        self._unsupported.add(endpoint)
+
+    def mark_registered(self, endpoint, query, registered=True):
+        digest = self.hash(query)
+        with self._lock:
+            hashes = self._registered.setdefault(endpoint, set())
+            if (digest in hashes) == registered:
+                return
+            if registered:
+                hashes.add(digest)
+            else:
+                hashes.discard(digest)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({e: sorted(h) for e, h in self._registered.items()}, f)
+                os.replace(tmp_path, self.path)
+
+
+def get_apq():
+    """Registre APQ du processus, ou None si le mode APQ n'est pas activé (--apq)."""
+    return _apq
+
+
+def configure_apq(enabled=True, path=APQ_STATE_FILE):
+    global _apq
+    _apq = PersistedQueries(path) if enabled else None
+    return _apq
+
+
+def known_documents():
+    """Documents GraphQL du projet, par nom (registre APQ, à pré-enregistrer côté serveur si besoin)."""
+    documents = {"monitorings": MONITORINGS_QUERY, "monitorings_window": MONITORINGS_WINDOW_QUERY}
+    for field in sorted(DOMAIN_FIELDS) + list(USER_LOOKUP_FIELDS):
+        documents[f"lookup_{field}"] = build_custom_operation(field, "")[1]
+    return documents
+
+
+def cache_key(endpoint, query, variables=None):
+    """Clé de cache : endpoint + requête aux espaces normalisés + variables triées."""
+    import hashlib
+    normalized = " ".join(query.split())
+    raw = "\n".join((endpoint, normalized, json.dumps(variables or {}, sort_keys=True, ensure_ascii=False)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Cache disque SQLite des réponses GraphQL, avec TTL par type et éviction LRU.
+
+    Une entrée expire après CACHE_TTL[kind] secondes. Au-delà de `max_entries`
+    entrées, les moins récemment lues sont supprimées. Seules les réponses sans
+    `errors` sont mises en cache. Avec refresh=True le cache n'est pas lu mais
+    continue d'être alimenté.
+    """
+
+    EVICT_EVERY = 500  # vérification de la taille toutes les N écritures
+
+    def __init__(self, path=CACHE_FILE, ttls=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, refresh=False):
+        import sqlite3
+        import threading
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def get(self, key):
+        if self.refresh:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self.db.execute("SELECT kind, value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            kind, value, created = row
+            if now - created > self.ttls.get(kind, 0):
+                self.db.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self.db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def put(self, key, kind, data):
+        if data.get("errors"):
+            return
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results (key, kind, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, json.dumps(data, ensure_ascii=False), now, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        (count,) = self.db.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_entries:
+            # Descend à 90 % de la capacité pour ne pas évincer à chaque écriture
+            self.db.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                (count - int(self.max_entries * 0.9),),
+            )
+
+
+def get_cache():
+    """Cache partagé par le processus, ou None s'il est désactivé."""
+    return _cache
+
+
+def configure_cache(path=CACHE_FILE, enabled=True, refresh=False, max_entries=CACHE_MAX_ENTRIES):
+    global _cache
+    _cache = ResultCache(path, max_entries=max_entries, refresh=refresh) if enabled else None
+    return _cache
+
+
+def api_url(dev=False):
+    """URL GraphQL à utiliser : endpoint forcé (--endpoint), sinon BRANDSHELTER_API_URL
+    pour prod et BRANDSHELTER_API_URL_DEV pour dev, sinon l'URL prod ou dev par défaut."""
+    if _api_url:
+        return _api_url
+    if dev:
+        return os.environ.get("BRANDSHELTER_API_URL_DEV") or API_URL_DEV
+    return os.environ.get("BRANDSHELTER_API_URL") or API_URL_PROD
+
+
+def configure_endpoint(url):
+    global _api_url
+    _api_url = url
+
+
+def get_session(http2=False, pool_maxsize=POOL_MAXSIZE):
+    """Retourne le client HTTP partagé par tout le processus (créé au premier appel).
+
+    Les en-têtes sont construits une seule fois et les connexions TCP/TLS sont
+    réutilisées d'une requête à l'autre. Avec http2=True, utilise httpx (si
+    installé avec l'extra http2) pour multiplexer les requêtes sur une connexion.
+    """
+    global _session, _timings
+    if _session is not None:
+        return _session
+
+    import threading
+    _timings = threading.local()
+    if http2:
+        try:
+            import httpx
+            _session = httpx.Client(
+                http2=True,
+                headers=make_headers(),
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+            )
+            return _session
+        except ImportError:
+            console.print("[yellow]⚠️ httpx[http2] non installé, utilisation de HTTP/1.1 keep-alive[/]")
+
+    import requests
+
+    session = requests.Session()
+    adapter = _timed_adapter(pool_connections=POOL_MAXSIZE, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(make_headers())
+    _session = session
+    return _session
+
+
+def _timed_adapter(**kwargs):
+    """HTTPAdapter dont les connexions urllib3 mesurent l'établissement TCP (DNS compris) et TLS.
+
+    Les durées sont ajoutées à _timings.connect_ms / _timings.tls_ms du thread
+    appelant ; elles restent à 0 quand une connexion du pool est réutilisée.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedConnectMixin:
+        def _new_conn(self):
+            started = time.perf_counter()
+            sock = super()._new_conn()
+            _timings.connect_ms = getattr(_timings, "connect_ms", 0.0) + (time.perf_counter() - started) * 1000
+            return sock
+
+    class TimedHTTPConnection(TimedConnectMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectMixin, HTTPSConnection):
+        def connect(self):
+            connect_ms = getattr(_timings, "connect_ms", 0.0)
+            started = time.perf_counter()
+            super().connect()
+            # connect() = _new_conn() + handshake : le TLS est le reste
+            tcp_ms = getattr(_timings, "connect_ms", 0.0) - connect_ms
+            _timings.tls_ms = getattr(_timings, "tls_ms", 0.0) + (time.perf_counter() - started) * 1000 - tcp_ms
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **pool_kwargs):
+            super().init_poolmanager(*args, **pool_kwargs)
+            self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+    return TimedHTTPAdapter(**kwargs)
+
+
+def _httpx_trace(event, info):
+    """Extension trace de httpx : mêmes mesures que _timed_adapter (connect, TLS, premier octet)."""
+    now = time.perf_counter()
+    marks = _timings.marks
+    if event.endswith(".started"):
+        marks[event[:-len(".started")]] = now
+    elif event == "connection.connect_tcp.complete":
+        _timings.connect_ms += (now - marks.get("connection.connect_tcp", now)) * 1000
+    elif event == "connection.start_tls.complete":
+        _timings.tls_ms += (now - marks.get("connection.start_tls", now)) * 1000
+    elif event.endswith("receive_response_headers.complete"):
+        _timings.ttfb_ms = (now - _timings.sent_at) * 1000
+
+
+class Histogram:
+    """Histogramme à seaux fixes (bornes supérieures incluses, +Inf implicite)."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        import bisect
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def cumulative(self):
+        """Comptes cumulés par borne (format Prometheus), +Inf compris."""
+        total = 0
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Quantile approché : borne supérieure du seau qui le contient (max pour +Inf)."""
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return self.max if bound == "+Inf" else min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 3), "min": self.min, "max": self.max,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9), "p99": self.quantile(0.99),
+                "buckets": {str(bound): total for bound, total in self.cumulative()}}
+
+
+class Metrics:
+    """Métriques des appels GraphQL, agrégées par opération (cost_key) en histogrammes.
+
+    observe() reçoit le dict `stats` rempli par post_graphql/_post_once pour chaque
+    requête logique (reprises comprises) : durées de connexion, TLS, premier octet et
+    totale, octets envoyés et reçus, complexité estimée et facturée, attentes du rate
+    limiter et des reprises. Le résultat est écrit à la sortie du processus (dump).
+    """
+
+    HISTOGRAMS = {
+        "connect_ms": "ms", "tls_ms": "ms", "ttfb_ms": "ms", "total_ms": "ms", "decode_ms": "ms",
+        "throttle_wait_ms": "ms", "retry_wait_ms": "ms", "request_bytes": "bytes", "response_bytes": "bytes",
+        "estimated_complexity": "complexity", "reported_complexity": "complexity", "complexity_ratio": "ratio",
+    }
+    STATS_FIELDS = {"total_ms": "request_ms", "response_bytes": "bytes", "estimated_complexity": "estimated",
+                    "reported_complexity": "reported"}
+
+    def __init__(self, verbose=False):
+        import threading
+        self.verbose = verbose
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.histograms = {}  # (nom, opération) -> Histogram
+        self.counters = {}  # (nom, opération, valeur du label) -> nombre
+
+    def _count(self, name, operation, label="", value=1):
+        key = (name, operation, label)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, operation, stats, outcome):
+        operation = operation or "query"
+        values = {name: stats.get(self.STATS_FIELDS.get(name, name)) for name in self.HISTOGRAMS}
+        if not stats.get("connect_ms"):
+            values["connect_ms"] = values["tls_ms"] = None  # connexion réutilisée
+        if values["estimated_complexity"] and values["reported_complexity"] is not None:
+            values["complexity_ratio"] = values["reported_complexity"] / values["estimated_complexity"]
+        with self._lock:
+            self._count("requests", operation, outcome)
+            if outcome == "cache":
+                return
+            if stats.get("status") is not None:
+                self._count("responses", operation, str(stats["status"]))
+            self._count("retries", operation, value=stats.get("retries") or 0)
+            self._count("connections", operation, value=1 if stats.get("connect_ms") else 0)
+            for name, value in values.items():
+                if value is not None:
+                    histogram = self.histograms.get((name, operation))
+                    if histogram is None:
+                        histogram = self.histograms[(name, operation)] = Histogram(METRICS_BUCKETS[self.HISTOGRAMS[name]])
+                    histogram.observe(value)
+        if self.verbose:
+            def ms(name):
+                return f"{stats[name]:.1f} ms" if stats.get(name) is not None else "-"
+
+            def number(name):
+                return f"{stats[name]:.0f}" if stats.get(name) is not None else "-"
+            connection = f"connexion {ms('connect_ms')}, TLS {ms('tls_ms')}" if stats.get("connect_ms") else "connexion réutilisée"
+            err_console.print(
+                f"[dim]📈 {operation} {stats.get('status') or outcome} : {connection}, 1er octet {ms('ttfb_ms')}, "
+                f"total {ms('request_ms')}, ↑{stats.get('request_bytes') or 0} ↓{stats.get('bytes') or 0} octets, "
+                f"complexité {number('reported')}/{number('estimated')}, reprises {stats.get('retries') or 0}, "
+                f"attente {(stats.get('throttle_wait_ms') or 0) / 1000:.1f}s[/]", highlight=False)
+
+    def to_dict(self):
+        with self._lock:
+            data = {"started": datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec="seconds"),
+                    "duration_s": round(time.time() - self.started, 3), "counters": {}, "histograms": {}}
+            for (name, operation, label), value in sorted(self.counters.items()):
+                entry = data["counters"].setdefault(name, {}).setdefault(operation, {})
+                entry[label or "total"] = value
+            for (name, operation), histogram in sorted(self.histograms.items()):
+                data["histograms"].setdefault(name, {})[operation] = histogram.to_dict()
+        return data
+
+    def to_prometheus(self):
+        """Format texte Prometheus (collecteur textfile de node_exporter)."""
+        def labels(operation, **extra):
+            pairs = [("operation", operation)] + [(k, v) for k, v in extra.items() if v != ""]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name in sorted({key[0] for key in self.counters}):
+                metric = f"bs_graphql_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                label_name = "outcome" if name == "requests" else "status"
+                for (counter, operation, label), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f"{metric}{labels(operation, **{label_name: label})} {value}")
+            for name in sorted({key[0] for key in self.histograms}):
+                metric = f"bs_graphql_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for (histogram_name, operation), histogram in sorted(self.histograms.items()):
+                    if histogram_name != name:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        lines.append(f"{metric}_bucket{labels(operation, le=bound)} {total}")
+                    lines.append(f"{metric}_sum{labels(operation)} {histogram.sum:.3f}")
+                    lines.append(f"{metric}_count{labels(operation)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Écrit les métriques dans `path` (Prometheus si .prom, JSON sinon), de façon atomique."""
+        content = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.to_dict(), indent=2) + "\n"
+        if path == "-":
+            sys.stderr.write(content)
+            return
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+def get_metrics():
+    """Collecteur de métriques du processus, ou None si --metrics-out n'est pas demandé."""
+    return _metrics
+
+
+def configure_metrics(path=None, verbose=False):
+    """Active la collecte ; avec `path`, les métriques y sont écrites à la sortie du processus."""
+    global _metrics
+    import atexit
+    _metrics = Metrics(verbose=verbose)
+    if path:
+        atexit.register(_metrics.dump, path)
+    return _metrics
+
+
+_orjson = None
+
+
+def decode_json(content):
+    """Décode une réponse JSON (bytes), avec orjson s'il est installé."""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson as _orjson  # décodage rapide, directement depuis les octets
+        except ImportError:
+            _orjson = False
+    if _orjson:
+        return _orjson.loads(content)
+    return json.loads(content)
+
+
+def post_graphql(endpoint, query, variables=None, cost_key=None, units=1, unit_cost=COMPLEXITY_PER_NODE, cache_kind=None, stats=None):
+    """Envoie la requête et retourne la réponse décodée, sans rien afficher.
+
+    Avec `cost_key` (type de requête), l'appel passe par le rate limiter partagé :
+    le coût estimé (units × coût unitaire appris, ou `unit_cost` à défaut) est
+    réservé avant l'envoi puis corrigé avec la complexité renvoyée par l'API.
+    Avec `cache_kind` (clé de CACHE_TTL), la réponse est lue puis écrite dans le
+    cache local ; un hit ne consomme aucun budget.
+    `stats` (dict) reçoit les mesures de la requête : bytes, request_bytes, request_ms,
+    decode_ms, connect_ms, tls_ms, ttfb_ms, status, estimated, reported,
+    throttle_wait_ms, retry_wait_ms, retries, cached ; elles alimentent aussi
+    get_metrics() quand --metrics-out est actif.
+    Lève GraphQLRequestError en cas d'échec, pour que l'appelant décide quoi en faire.
+    """
+    metrics = get_metrics()
+    if stats is None and metrics:
+        stats = {}
+    cache = get_cache() if cache_kind else None
+    if cache:
+        key = cache_key(endpoint, query, variables)
+        cached = cache.get(key)
+        if cached is not None:
+            if stats is not None:
+                stats.update(bytes=0, request_bytes=0, request_ms=0.0, decode_ms=0.0, cached=True, retries=0)
+            if metrics:
+                metrics.observe(cost_key or cache_kind, stats, "cache")
+            return cached
+
+    policy = get_retry_policy()
+    breaker = get_circuit_breaker()
+    retryable = policy.is_idempotent(query)
+    attempt = 0
+    try:
+        while True:
+            try:
+                breaker.before_call(endpoint)
+                data = _post_once(endpoint, query, variables, cost_key, units, unit_cost, stats)
+            except CircuitOpenError as e:
+                # Circuit ouvert : rien n'est envoyé, on attend la fin du cooldown pour réessayer
+                if not retryable or attempt >= policy.max_retries:
+                    raise
+                error, delay = e, max(e.retry_after, policy.delay(attempt))
+            except GraphQLRequestError as e:
+                if not policy.is_retryable(e):
+                    breaker.record_success(endpoint)  # l'endpoint répond, l'erreur vient de la requête
+                    raise
+                breaker.record_failure(endpoint)
+                if not retryable or attempt >= policy.max_retries:
+                    raise
+                error, delay = e, policy.delay(attempt, e.retry_after)
+            else:
+                breaker.record_success(endpoint)
+                break
+            attempt += 1
+            if policy.verbose:
+                err_console.print(f"[yellow]🔁 {escape_markup(error)} — nouvelle tentative {attempt}/{policy.max_retries} dans {delay:.1f}s[/]", highlight=False)
+            if stats is not None:
+                stats["retry_wait_ms"] = stats.get("retry_wait_ms", 0.0) + delay * 1000
+            policy.sleep(delay)
+    except GraphQLRequestError:
+        if metrics:
+            stats["retries"] = attempt
+            metrics.observe(cost_key, stats, "error")
+        raise
+
+    if stats is not None:
+        stats["retries"] = attempt
+    if metrics:
+        metrics.observe(cost_key, stats, "ok")
+    if cache:
+        cache.put(key, cache_kind, data)
+    return data
+
+
+def _send(endpoint, payload):
+    """POST du payload déjà sérialisé ; retourne (réponse, octets envoyés).
+
+    Le délai jusqu'aux en-têtes de la réponse est noté dans _timings.ttfb_ms.
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    session = get_session()
+    if hasattr(session, "mount"):  # requests : elapsed s'arrête à la réception des en-têtes
+        resp = session.post(endpoint, data=body, timeout=REQUEST_TIMEOUT)
+        _timings.ttfb_ms = resp.elapsed.total_seconds() * 1000
+        return resp, len(body)
+    _timings.sent_at = time.perf_counter()
+    return session.post(endpoint, content=body, timeout=REQUEST_TIMEOUT, extensions={"trace": _httpx_trace}), len(body)  # httpx
+
+
+def _apq_exchange(apq, endpoint, query, variables):
+    """Envoi APQ : hash seul si possible, texte complet sur PersistedQueryNotFound,
+    texte sans extension si le serveur ne supporte pas APQ. Retourne (réponse, octets envoyés, dernier payload)."""
+    payload = apq.payload(endpoint, query, variables)
+    resp, sent = _send(endpoint, payload)
+    for _ in range(2):
+        if resp.status_code >= 500 or not resp.content:
+            break
+        try:
+            data = decode_json(resp.content)
+        except ValueError:
+            break
+        if not isinstance(data, dict):
+            break
+        if apq.is_unsupported(data):
+            apq.disable(endpoint)
+        elif apq.is_miss(data) and "query" not in payload:
+            apq.mark_registered(endpoint, query, registered=False)
+        else:
+            break
+        payload = apq.payload(endpoint, query, variables, full=True)
+        resp, extra = _send(endpoint, payload)
+        sent += extra
+    return resp, sent, payload
+
+
+def _post_once(endpoint, query, variables, cost_key, units, unit_cost, stats):
+    """Une tentative d'envoi : réservation du budget, requête (APQ si activé), décodage, correction du budget."""
+    limiter = get_rate_limiter() if cost_key else None
+    charged = 0
+    if limiter:
+        estimated = limiter.estimate(endpoint, cost_key, units, unit_cost)
+        charged = min(estimated, limiter.capacity)  # ce qu'acquire prélève réellement
+        waited = limiter.acquire(endpoint, charged)
+        if stats is not None:
+            stats.update(estimated=estimated, throttle_wait_ms=stats.get("throttle_wait_ms", 0.0) + waited * 1000)
+
+    apq = get_apq()
+    resp = None
+    get_session()
+    _timings.connect_ms = _timings.tls_ms = 0.0
+    _timings.ttfb_ms = None
+    _timings.marks = {}
+    try:
+        started = time.perf_counter()
+        if apq:
+            resp, sent, payload = _apq_exchange(apq, endpoint, query, variables)
+        else:
+            payload = {"query": query}
+            if variables:
+                payload["variables"] = variables
+            resp, sent = _send(endpoint, payload)
+        if resp.status_code == 429 and limiter:
+            limiter.throttled(endpoint, _parse_retry_after(resp.headers.get("Retry-After")))
+        resp.raise_for_status()
+        content = resp.content
+        received = time.perf_counter()
+        data = decode_json(content)
+    except Exception as e:
+        status = resp.status_code if resp is not None else None
+        retry_after = _parse_retry_after(resp.headers.get("Retry-After")) if resp is not None else None
+        if stats is not None:
+            stats.update(status=status, request_ms=(time.perf_counter() - started) * 1000, connect_ms=_timings.connect_ms,
+                         tls_ms=_timings.tls_ms, ttfb_ms=_timings.ttfb_ms, cached=False)
+        raise GraphQLRequestError(str(e), resp.text if resp is not None else "", status, retry_after) from e
+    if stats is not None:
+        stats.update(bytes=len(content), request_bytes=sent, request_ms=(received - started) * 1000,
+                     decode_ms=(time.perf_counter() - received) * 1000, cached=False, status=resp.status_code,
+                     connect_ms=_timings.connect_ms, tls_ms=_timings.tls_ms, ttfb_ms=_timings.ttfb_ms)
+    if apq and "query" in payload and "extensions" in payload and not data.get("errors"):
+        apq.mark_registered(endpoint, query)
+
+    reported, remaining = extract_complexity(data, resp.headers)
+    if stats is not None:
+        stats["reported"] = reported
+    if limiter:
+        limiter.record(endpoint, cost_key, units, charged, reported, remaining)
+
+    codes = {((error.get("extensions") or {}).get("code") or "").upper() for error in data.get("errors") or []}
+    if codes & RETRY_ERROR_CODES:
+        if limiter:
+            limiter.throttled(endpoint, _parse_retry_after(resp.headers.get("Retry-After")))
+        raise GraphQLRequestError(f"requête limitée par l'API ({', '.join(sorted(codes & RETRY_ERROR_CODES))})",
+                                  resp.text, 429, _parse_retry_after(resp.headers.get("Retry-After")))
+    return data
+
+
+def summarize_response(data):
+    """Résumé d'une ligne : taille des listes/connexions de chaque champ racine, nombre d'erreurs."""
+    parts = []
+    for name, value in (data.get("data") or {}).items():
+        if isinstance(value, dict) and isinstance(value.get("nodes"), list):
+            parts.append(f"{name}: {len(value['nodes'])} nodes")
+        elif isinstance(value, list):
+            parts.append(f"{name}: {len(value)} éléments")
+        elif value is None:
+            parts.append(f"{name}: null")
+        else:
+            parts.append(f"{name}: {len(value) if isinstance(value, dict) else 1} champs")
+    if data.get("errors"):
+        parts.append(f"{len(data['errors'])} erreur(s)")
+    return ", ".join(parts) or "réponse vide"
+
+
+def query_graphql(endpoint, query, verbose=False, variables=None, cost_key=None, units=1, unit_cost=COMPLEXITY_PER_NODE,
+                  cache_kind=None, render="auto"):
+    """Envoie la requête et affiche la réponse selon `render` (voir RENDER_POLICIES).
+
+    "full" colore le JSON complet, "summary" n'affiche qu'une ligne de résumé,
+    "none" rien ; "auto" choisit "full" sous RENDER_FULL_MAX_BYTES, "summary" au-delà.
+    Retourne la réponse décodée, ou None en cas d'erreur (affichée).
+    """
     def render_query_with_values(query, variables):
         if not variables:
             return query
@@ -51,35 +1163,37 @@ def query_graphql(endpoint, query, verbose=False, variables=None):
 
     if verbose:
         console.print("[bold green]📤 Requête GraphQL envoyée :[/]")
-        console.print(Syntax(query, "graphql", theme="monokai"))
+        console.print_code(query, "graphql")
         if variables:
             console.print("[bold yellow]📦 Variables :[/]")
-            console.print(Syntax(json.dumps(variables, indent=2, ensure_ascii=False), "json", theme="monokai"))
+            console.print_code(json.dumps(variables, indent=2, ensure_ascii=False), "json")
             console.print("[bold cyan]🔎 Requête avec valeurs :[/]")
-            console.print(Syntax(render_query_with_values(query, variables), "graphql", theme="monokai"))
+            console.print_code(render_query_with_values(query, variables), "graphql")
 
+    stats = {}
     try:
-        payload = {"query": query}
-        if variables:
-            payload["variables"] = variables
+        data = post_graphql(endpoint, query, variables, cost_key=cost_key, units=units, unit_cost=unit_cost,
+                            cache_kind=cache_kind, stats=stats)
+    except GraphQLRequestError as e:
+        console.print(f"[bold red]❌ Erreur API :[/] {escape_markup(e)}")
+        console.print(e.response_text, markup=False)
+        return None
 
-        resp = requests.post(endpoint, headers=make_headers(), json=payload)
-        resp.raise_for_status()
-        data = resp.json()
+    if render == "auto":
+        render = "full" if stats["bytes"] <= RENDER_FULL_MAX_BYTES else "summary"
+    started = time.perf_counter()
+    if render == "full":
         json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        console.print(Syntax(json_str, "json", theme="monokai", line_numbers=False))
-        return data
-    except Exception as e:
-        console.print(f"[bold red]❌ Erreur API :[/] {e}")
-        console.print(resp.text if resp else "")
-        return None
+        console.print_code(json_str, "json")
+    elif render == "summary":
+        console.print(f"[cyan]📦 {stats['bytes']} octets — {escape_markup(summarize_response(data))}[/]", highlight=False)
+    if verbose:
+        origin = "cache" if stats["cached"] else f"requête {stats['request_ms']:.0f} ms ({stats['request_bytes']} octets envoyés), décodage {stats['decode_ms']:.1f} ms"
+        console.print(f"[dim]⏱️ {origin}, rendu {render} {(time.perf_counter() - started) * 1000:.1f} ms, {stats['bytes']} octets[/]")
+    return data
 
 
-def paginate_monitorings(dev=False, verbose=False, limit=None, createdAtGt=None):
-    url = API_URL_DEV if dev else API_URL_PROD
-    if not createdAtGt:
-        createdAtGt = datetime.now().strftime("%Y-%m-%dT00:00:00Z")
-    query = """
+MONITORINGS_QUERY = """
     query ($first: Int, $after: String, $createdAtGt: ISO8601DateTime) {
       monitoringsSafebrands(first: $first, after: $after, createdAtGt: $createdAtGt) {
         nodes {
@@ -131,82 +1245,819 @@ def paginate_monitorings(dev=False, verbose=False, limit=None, createdAtGt=None)
     }
     """
 
-    first = 49
-    after = None
-    total = 0
-    # Complexité par node (donnée par l'utilisateur)
-    COMPLEXITY_PER_NODE = 500  # estimation basée sur 100 nodes = 50007
-    SAFE_COMPLEXITY = 85000
-    SECONDS_PER_MIN = 60
-    last_request_time = None
-
-    while True:
-        if limit is not None:
-            remaining = limit - total
-            if remaining <= 0:
-                break
-            batch_size = min(first, remaining)
-        else:
-            batch_size = first
-        variables = {"first": batch_size, "after": after, "createdAtGt": createdAtGt}
-
-        # Calcul de la complexité de la requête
-        query_complexity = batch_size * COMPLEXITY_PER_NODE
-        min_seconds_between_requests = query_complexity * SECONDS_PER_MIN / SAFE_COMPLEXITY
-
-        if last_request_time:
-            elapsed = time.time() - last_request_time
-            if elapsed < min_seconds_between_requests:
-                to_wait = min_seconds_between_requests - elapsed
-                if verbose:
-                    console.print(f"[yellow]⏳ Attente {to_wait:.1f}s pour respecter le rate limit par node...[/]")
-                time.sleep(to_wait)
-        last_request_time = time.time()
-
-        data = query_graphql(url, query, verbose=verbose, variables=variables)
-        if not data:
-            break
+# Variante bornée par createdAtLt, utilisée par l'export par fenêtres de temps (--shards)
+MONITORINGS_WINDOW_QUERY = MONITORINGS_QUERY.replace(
+    "$createdAtGt: ISO8601DateTime)", "$createdAtGt: ISO8601DateTime, $createdAtLt: ISO8601DateTime)"
+).replace("createdAtGt: $createdAtGt)", "createdAtGt: $createdAtGt, createdAtLt: $createdAtLt)")
 
-        monitorings = data.get("data", {}).get("monitoringsSafebrands", {})
-        nodes = monitorings.get("nodes", [])
-        page_info = monitorings.get("pageInfo", {})
+# Colonnes des exports, dans l'ordre de la requête (champs des fragments inclus)
+MONITORING_COLUMNS = ["id", "__typename", "referenceNumber", "createdAt", "active", "domainNameMonitoringFolder", "target"]
+MONITORINGS_PAGE_SIZE = 49
 
-        def flatten(d, parent_key="", sep="."):
-            items = []
-            for k, v in d.items():
-                new_key = f"{parent_key}{sep}{k}" if parent_key else k
-                if isinstance(v, dict):
-                    items.extend(flatten(v, new_key, sep=sep).items())
-                else:
-                    items.append((new_key, v))
-            return dict(items)
+# Projection (--fields) : champs communs et champs de chaque fragment de MONITORINGS_QUERY
+MONITORING_BASE_FIELDS = ("id", "__typename", "referenceNumber", "createdAt")
+MONITORING_FRAGMENT_FIELDS = {
+    "LogoMonitoring": ("active", "domainNameMonitoringFolder"),
+    "ContentMonitoring": ("active", "domainNameMonitoringFolder"),
+    "DomainAudit": ("active", "domainNameMonitoringFolder"),
+    "DomainMonitoring": ("active", "domainNameMonitoringFolder"),
+    "SocialMediaMonitoring": ("active", "domainNameMonitoringFolder"),
+    "WebPageAndWhoisMonitoring": ("active", "target"),
+    "RegistrantSearch": ("active",),
+    "Analysis": ("active",),
+    "Consultation": ("active",),
+}
+MONITORING_REQUIRED_FIELDS = ("id", "__typename", "createdAt")  # dédoublonnage des fenêtres, synchro, aplatisseurs
+MONITORINGS_MAX_PAGE_SIZE = 100
+QUERY_BASE_COMPLEXITY = 7  # part fixe de la complexité d'une page (100 nodes = 50007)
+EXPORT_FORMATS = ("ndjson", "csv", "parquet", "sqlite")
+PARQUET_CHUNK_ROWS = 10000
 
-        for node in nodes:
-            flat_node = flatten(node)
-            # Affichage sur une seule ligne : clé: valeur séparés par un espace
-            console.print(" ".join(f"{k}: {v}" for k, v in flat_node.items()))
 
-        total += len(nodes)
-        if verbose:
-            console.print(f"[blue]🔁 Page suivante : {page_info.get('endCursor')}[/]")
+def parse_monitoring_fields(spec):
+    """Valide une liste de champs `--fields` (séparés par des virgules) et la complète.
 
-        if not page_info.get("hasNextPage") or (limit is not None and total >= limit):
-            break
-        after = page_info.get("endCursor")
+    Retourne un tuple dans l'ordre de MONITORING_COLUMNS, avec les champs
+    indispensables (MONITORING_REQUIRED_FIELDS), ou None pour la requête complète.
+    """
+    if not spec:
+        return None
+    requested = {field.strip() for field in spec.split(",") if field.strip()}
+    unknown = requested - set(MONITORING_COLUMNS)
+    if unknown:
+        raise SystemExit(f"❌ Champ(s) inconnu(s) pour --fields : {', '.join(sorted(unknown))} "
+                         f"(disponibles : {', '.join(MONITORING_COLUMNS)})")
+    requested.update(MONITORING_REQUIRED_FIELDS)
+    fields = tuple(c for c in MONITORING_COLUMNS if c in requested)
+    return None if fields == tuple(MONITORING_COLUMNS) else fields
 
-    console.print(f"[bold green]✅ {total} monitorings récupérés.[/]")
 
+def _monitoring_leaves(fields):
+    """Nombre de champs feuilles sélectionnés par node, fragments compris."""
+    selected = set(fields)
+    return sum(f in selected for f in MONITORING_BASE_FIELDS) + \
+        sum(f in selected for frag in MONITORING_FRAGMENT_FIELDS.values() for f in frag)
 
-def query_custom(field, value, dev=False, verbose=False):
-    url = API_URL_DEV if dev else API_URL_PROD
 
-    if field == "clientNumber" and len(value) < 8:
-        value = value.zfill(10) + "-1"
+def build_monitorings_query(fields=None, window=False):
+    """Document monitoringsSafebrands réduit aux champs `fields` (fragments vides omis).
 
-    if field in DOMAIN_FIELDS:
-        query = f"""
-        query {{
-            domains({field}: "{value}") {{
+    Sans projection, retourne MONITORINGS_QUERY / MONITORINGS_WINDOW_QUERY tels quels.
+    """
+    if not fields:
+        return MONITORINGS_WINDOW_QUERY if window else MONITORINGS_QUERY
+    selected = set(fields)
+    lines = [f"          {f}" for f in MONITORING_BASE_FIELDS if f in selected]
+    for typename, frag_fields in MONITORING_FRAGMENT_FIELDS.items():
+        kept = [f for f in frag_fields if f in selected]
+        if kept:
+            lines.append(f"          ... on {typename} {{ {' '.join(kept)} }}")
+    if window:
+        header = "query ($first: Int, $after: String, $createdAtGt: ISO8601DateTime, $createdAtLt: ISO8601DateTime)"
+        arguments = "first: $first, after: $after, createdAtGt: $createdAtGt, createdAtLt: $createdAtLt"
+    else:
+        header = "query ($first: Int, $after: String, $createdAtGt: ISO8601DateTime)"
+        arguments = "first: $first, after: $after, createdAtGt: $createdAtGt"
+    nodes = "\n".join(lines)
+    return f"""
+    {header} {{
+      monitoringsSafebrands({arguments}) {{
+        nodes {{
+{nodes}
+        }}
+        pageInfo {{
+          hasNextPage
+          endCursor
+        }}
+      }}
+    }}
+    """
+
+
+def monitoring_node_cost(fields=None):
+    """Complexité estimée d'un node : COMPLEXITY_PER_NODE au prorata des champs sélectionnés."""
+    if not fields:
+        return COMPLEXITY_PER_NODE
+    return max(1, COMPLEXITY_PER_NODE * _monitoring_leaves(fields) // _monitoring_leaves(MONITORING_COLUMNS))
+
+
+def monitorings_page_size(unit_cost):
+    """Plus grande page dont la complexité tient dans MAX_QUERY_COMPLEXITY (49 pour la requête complète)."""
+    size = int((MAX_QUERY_COMPLEXITY - QUERY_BASE_COMPLEXITY) // max(unit_cost, 1))
+    return max(1, min(MONITORINGS_MAX_PAGE_SIZE, size))
+
+
+def flatten(d, parent_key="", sep="."):
+    items = []
+    for k, v in d.items():
+        new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        if isinstance(v, dict):
+            items.extend(flatten(v, new_key, sep=sep).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+_flatteners = {}
+
+
+def _key_paths(node, prefix=()):
+    for k, v in node.items():
+        if isinstance(v, dict):
+            yield from _key_paths(v, prefix + (k,))
+        else:
+            yield prefix + (k,), v
+
+
+def _compile_flattener(node, sep="."):
+    """Génère une fonction qui construit la ligne aplatie d'un node de même forme en une expression dict.
+
+    Un champ null au moment de la compilation pourrait être un objet dans un autre
+    node : la fonction générée le vérifie et lève TypeError pour repasser par flatten().
+    """
+    items = []
+    lines = ["def flatten_node(n):"]
+    for path, value in _key_paths(node):
+        access = "n" + "".join(f"[{k!r}]" for k in path)
+        items.append(f"{sep.join(path)!r}: {access}")
+        if value is None:
+            lines.append(f"    if type({access}) is dict: raise TypeError")
+    lines.append(f"    return {{{', '.join(items)}}}")
+    namespace = {}
+    exec(compile("\n".join(lines) + "\n", "<flattener>", "exec"), namespace)
+    return namespace["flatten_node"]
+
+
+def flatten_node(node):
+    """Aplatit un node comme flatten(), via un aplatisseur compilé par __typename.
+
+    La forme d'un node est fixée par le fragment de son __typename dans la requête :
+    l'aplatisseur est généré au premier node de chaque type puis réutilisé. Il est
+    regénéré si la forme change (autre requête), et un node qui ne correspond pas
+    (objet imbriqué null ou incomplet) repasse par flatten().
+    """
+    typename = node.get("__typename")
+    entry = _flatteners.get(typename)
+    if entry is None or entry[0] != len(node):
+        entry = _flatteners[typename] = (len(node), _compile_flattener(node))
+    try:
+        return entry[1](node)
+    except KeyError:
+        _flatteners[typename] = (len(node), _compile_flattener(node))
+        return flatten(node)
+    except TypeError:
+        return flatten(node)
+
+
+def iter_monitoring_pages(dev=False, verbose=False, limit=None, createdAtGt=None, after=None, render=None, createdAtLt=None,
+                          fields=None):
+    """Parcourt monitoringsSafebrands page par page et produit (nodes, pageInfo).
+
+    Avec `render` (politique d'affichage de query_graphql), chaque page est affichée ;
+    sinon rien n'est affiché. Une erreur persistante (après reprises) remonte en
+    GraphQLRequestError, pour qu'un export incomplet ne passe pas pour un export terminé.
+    Avec createdAtLt, seule la fenêtre ]createdAtGt, createdAtLt[ est parcourue.
+    Avec `fields` (parse_monitoring_fields), la requête est réduite à ces champs et la
+    taille de page déduite de la complexité par node, apprise ou estimée.
+    """
+    url = api_url(dev)
+    if not createdAtGt:
+        createdAtGt = datetime.now().strftime("%Y-%m-%dT00:00:00Z")
+
+    query = build_monitorings_query(fields, window=bool(createdAtLt))
+    if fields:
+        cost_key = "monitoringsSafebrands:" + ",".join(fields)
+        unit_cost = monitoring_node_cost(fields)
+        first = monitorings_page_size(get_rate_limiter().estimate(url, cost_key, 1, unit_cost))
+        if verbose:
+            err_console.print(f"[dim]🔎 Projection {', '.join(fields)} : ~{unit_cost} de complexité par node, pages de {first}[/]")
+    else:
+        cost_key, unit_cost = "monitoringsSafebrands", COMPLEXITY_PER_NODE
+        first = MONITORINGS_PAGE_SIZE
+    total = 0
+
+    while True:
+        if limit is not None:
+            remaining = limit - total
+            if remaining <= 0:
+                break
+            batch_size = min(first, remaining)
+        else:
+            batch_size = first
+        variables = {"first": batch_size, "after": after, "createdAtGt": createdAtGt}
+        if createdAtLt:
+            variables["createdAtLt"] = createdAtLt
+
+        # Le rate limiter réserve batch_size × coût par node avant l'envoi
+        if render:
+            data = query_graphql(url, query, verbose=verbose, variables=variables,
+                                 cost_key=cost_key, units=batch_size, unit_cost=unit_cost, render=render)
+            if not data:
+                raise GraphQLRequestError(f"export interrompu après {total} monitorings (curseur {after})")
+        else:
+            data = post_graphql(url, query, variables,
+                                cost_key=cost_key, units=batch_size, unit_cost=unit_cost)
+
+        monitorings = (data.get("data") or {}).get("monitoringsSafebrands") or {}
+        nodes = monitorings.get("nodes") or []
+        page_info = monitorings.get("pageInfo") or {}
+        total += len(nodes)
+        yield nodes, page_info
+
+        if verbose:
+            (console if render else err_console).print(f"[blue]🔁 Page suivante : {escape_markup(str(page_info.get('endCursor')))}[/]")
+        if not page_info.get("hasNextPage") or (limit is not None and total >= limit):
+            break
+        after = page_info.get("endCursor")
+
+
+def iter_monitorings(dev=False, verbose=False, limit=None, createdAtGt=None, fields=None):
+    """Générateur des monitorings aplatis (un dict par node), sans affichage."""
+    for nodes, _ in iter_monitoring_pages(dev=dev, verbose=verbose, limit=limit, createdAtGt=createdAtGt, fields=fields):
+        for node in nodes:
+            yield flatten_node(node)
+
+
+def _parse_iso(value):
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _format_iso(value):
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def split_time_windows(createdAtGt, createdAtLt, shards):
+    """Découpe ]createdAtGt, createdAtLt[ en `shards` fenêtres de même durée.
+
+    Chaque fenêtre après la première démarre une seconde avant la fin de la
+    précédente : createdAtGt/createdAtLt étant stricts, un monitoring créé pile
+    sur une borne serait sinon perdu. Les doublons de ce recouvrement sont
+    éliminés à la fusion. Retourne une liste de (gt, lt, début du recouvrement).
+    """
+    start = _parse_iso(createdAtGt)
+    end = _parse_iso(createdAtLt)
+    step = (end - start) / shards
+    windows = []
+    for i in range(shards):
+        lower = start + step * i
+        upper = end if i == shards - 1 else start + step * (i + 1)
+        gt = lower if i == 0 else lower - timedelta(seconds=1)
+        windows.append((_format_iso(gt), _format_iso(upper), gt))
+    return windows
+
+
+def iter_monitorings_sharded(dev=False, verbose=False, createdAtGt=None, createdAtLt=None,
+                             shards=DEFAULT_SHARDS, concurrency=DEFAULT_CONCURRENCY, limit=None, fields=None):
+    """Export parallèle par fenêtres de temps, produit des listes de nodes dans l'ordre des fenêtres.
+
+    Les fenêtres sont paginées en parallèle (au plus `concurrency` à la fois) sous le
+    même rate limiter. La fenêtre courante est transmise au fil de l'eau, les
+    suivantes gardent au plus SHARD_BUFFER_PAGES pages en mémoire puis attendent leur
+    tour (mémoire bornée ; sans interblocage, les fenêtres étant lancées dans l'ordre
+    de consommation). Les nodes présents dans deux
+    fenêtres (recouvrement d'une seconde) ne sont émis qu'une fois, par `id`.
+    """
+    import queue
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not createdAtGt:
+        createdAtGt = datetime.now().strftime("%Y-%m-%dT00:00:00Z")
+    if not createdAtLt:
+        createdAtLt = _format_iso(datetime.now(timezone.utc))
+    windows = split_time_windows(createdAtGt, createdAtLt, shards)
+    queues = [queue.Queue(maxsize=SHARD_BUFFER_PAGES) for _ in windows]
+    stop = threading.Event()
+    done = object()
+
+    def put(index, item):
+        # File pleine : on attend le consommateur, sauf s'il a abandonné (erreur, limite atteinte)
+        while not stop.is_set():
+            try:
+                queues[index].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def run_window(index):
+        gt, lt, _ = windows[index]
+        if stop.is_set():
+            put(index, done)
+            return
+        try:
+            for nodes, _ in iter_monitoring_pages(dev=dev, verbose=verbose, createdAtGt=gt, createdAtLt=lt, fields=fields):
+                if stop.is_set():
+                    break
+                put(index, nodes)
+        except Exception as e:
+            put(index, e)
+        finally:
+            put(index, done)
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index in range(len(windows)):
+            pool.submit(run_window, index)
+        try:
+            previous_tail = set()  # ids de la fenêtre précédente situés dans le recouvrement
+            for index in range(len(windows)):
+                overlap_start = windows[index + 1][2] if index + 1 < len(windows) else None
+                tail = set()
+                while True:
+                    item = queues[index].get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    nodes = [node for node in item if node.get("id") not in previous_tail]
+                    if overlap_start is not None:
+                        tail.update(node.get("id") for node in nodes
+                                    if node.get("createdAt") and _parse_iso(node["createdAt"]) >= overlap_start)
+                    if limit is not None:
+                        nodes = nodes[:limit - total]
+                    total += len(nodes)
+                    if nodes:
+                        yield nodes
+                    if limit is not None and total >= limit:
+                        return
+                previous_tail = tail
+        finally:
+            stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+class NDJSONSink:
+    """Écrit une ligne JSON par monitoring."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, rows):
+        self.stream.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class CSVSink:
+    """Écrit un CSV aux colonnes fixes (MONITORING_COLUMNS), vide si le champ est absent."""
+
+    def __init__(self, stream, columns=MONITORING_COLUMNS, header=True):
+        import csv
+        self.stream = stream
+        self.writer = csv.DictWriter(stream, fieldnames=columns, extrasaction="ignore")
+        if header:
+            self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    """Écrit un fichier Parquet par row groups de `chunk_rows` lignes (nécessite pyarrow)."""
+
+    def __init__(self, path, columns=MONITORING_COLUMNS, chunk_rows=PARQUET_CHUNK_ROWS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Le format parquet nécessite pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.columns = columns
+        self.chunk_rows = chunk_rows
+        self.schema = pa.schema([(c, pa.bool_() if c == "active" else pa.string()) for c in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.buffer = {c: [] for c in columns}
+        self.buffered = 0
+
+    def write(self, rows):
+        for row in rows:
+            for column in self.columns:
+                self.buffer[column].append(row.get(column))
+        self.buffered += len(rows)
+        if self.buffered >= self.chunk_rows:
+            self._flush()
+
+    def _flush(self):
+        if self.buffered:
+            self.writer.write_table(self.pa.Table.from_pydict(self.buffer, schema=self.schema))
+            self.buffer = {c: [] for c in self.columns}
+            self.buffered = 0
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+class MonitoringStore:
+    """Base SQLite locale des monitorings, indexée pour les requêtes hors ligne (--store-query).
+
+    Une ligne par monitoring (clé `id`), colonnes MONITORING_COLUMNS, chacune
+    indexée. Un node déjà présent est mis à jour ; seules les colonnes exportées
+    sont écrasées, donc un export projeté (--fields) garde les autres valeurs.
+    Sert aussi de sink d'export (write/close), une transaction par page.
+    """
+
+    def __init__(self, path, columns=MONITORING_COLUMNS):
+        import sqlite3
+        self.columns = [c for c in MONITORING_COLUMNS if c in columns]
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS monitorings ("
+            ' id TEXT PRIMARY KEY, __typename TEXT, referenceNumber TEXT, createdAt TEXT, active INTEGER,'
+            " domainNameMonitoringFolder TEXT, target TEXT, ingested REAL NOT NULL)"
+        )
+        for column in MONITORING_COLUMNS[1:]:
+            self.db.execute(f'CREATE INDEX IF NOT EXISTS monitorings_{column.strip("_")} ON monitorings ("{column}")')
+        names = ", ".join(f'"{c}"' for c in self.columns)
+        updates = ", ".join(f'"{c}" = excluded."{c}"' for c in self.columns if c != "id")
+        self._upsert = (f"INSERT INTO monitorings ({names}, ingested) VALUES ({', '.join('?' for _ in self.columns)}, ?) "
+                        f"ON CONFLICT (id) DO UPDATE SET {updates}, ingested = excluded.ingested")
+
+    def write(self, rows):
+        now = time.time()
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.executemany(self._upsert, ([row.get(c) for c in self.columns] + [now] for row in rows))
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def _condition(spec):
+        """`champ=valeur` → (clause SQL, paramètres) ; * et ? en joker (GLOB), null = absent."""
+        field, sep, value = spec.partition("=")
+        field = field.strip()
+        if not sep or field not in MONITORING_COLUMNS:
+            raise SystemExit(f"❌ Filtre invalide : {spec} (attendu champ=valeur, champs : {', '.join(MONITORING_COLUMNS)})")
+        if value.lower() == "null":
+            return f'"{field}" IS NULL', []
+        if field == "active":
+            if value.lower() not in ("true", "false", "1", "0", "oui", "non"):
+                raise SystemExit(f"❌ Valeur invalide pour active : {value} (true/false)")
+            return '"active" = ?', [int(value.lower() in ("true", "1", "oui"))]
+        if "*" in value or "?" in value:
+            return f'"{field}" GLOB ?', [value]
+        return f'"{field}" = ?', [value]
+
+    def query(self, where=(), createdAtGt=None, createdAtLt=None, limit=None, columns=MONITORING_COLUMNS):
+        """Produit les monitorings (dicts aplatis, triés par createdAt) correspondant à tous les filtres."""
+        clauses, params = [], []
+        for spec in where:
+            clause, values = self._condition(spec)
+            clauses.append(clause)
+            params.extend(values)
+        if createdAtGt:
+            clauses.append('"createdAt" > ?')
+            params.append(createdAtGt)
+        if createdAtLt:
+            clauses.append('"createdAt" < ?')
+            params.append(createdAtLt)
+        sql = f"SELECT {', '.join(chr(34) + c + chr(34) for c in columns)} FROM monitorings"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += ' ORDER BY "createdAt", id'
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for values in self.db.execute(sql, params):
+            row = dict(zip(columns, values))
+            if row.get("active") is not None:
+                row["active"] = bool(row["active"])
+            yield row
+
+
+class MonitoringSnapshot:
+    """Index des empreintes (hash du contenu) des monitorings, pour produire des changesets.
+
+    Table SQLite (id, hash, seen, row) : chaque node du parcours est comparé à son
+    empreinte précédente par lots (une requête par page), puis les ids non vus
+    pendant ce parcours sont les monitorings supprimés. Seule la page courante est
+    en mémoire, quelle que soit la taille du snapshot. Un parcours s'exécute dans
+    une seule transaction : interrompu, il ne modifie pas le snapshot.
+    """
+
+    def __init__(self, path, scope):
+        import sqlite3
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS snapshot (id TEXT PRIMARY KEY, hash TEXT NOT NULL, seen INTEGER NOT NULL, row TEXT NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS snapshot_seen ON snapshot (seen)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        scope = json.dumps(scope, sort_keys=True)
+        if meta.get("scope", scope) != scope:
+            raise SystemExit(f"❌ Le snapshot {path} a été pris avec d'autres paramètres ({meta['scope']}) : "
+                             "mêmes --createdAtGt/--createdAtLt/--fields requis, ou un autre fichier")
+        self.run = int(meta.get("run", 0)) + 1
+        self.db.execute("BEGIN")
+        self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (("scope", scope), ("run", str(self.run))))
+        self.counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+
+    @staticmethod
+    def digest(row):
+        import hashlib
+        return hashlib.blake2b(json.dumps(row, sort_keys=True, ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+    def compare(self, rows):
+        """Compare une page de nodes aplatis au snapshot ; retourne les changements (added/changed)."""
+        rows = {row["id"]: row for row in rows}
+        previous = {}
+        ids = list(rows)
+        for start in range(0, len(ids), 500):  # limite de variables SQLite
+            chunk = ids[start:start + 500]
+            previous.update((id_, (digest, row)) for id_, digest, row in self.db.execute(
+                f"SELECT id, hash, row FROM snapshot WHERE id IN ({', '.join('?' for _ in chunk)})", chunk))
+        changes, updates = [], []
+        for id_, row in rows.items():
+            digest = self.digest(row)
+            old = previous.get(id_)
+            if old is None:
+                changes.append({"op": "added", "id": id_, "node": row})
+            elif old[0] != digest:
+                before = json.loads(old[1])
+                diff = {k: [before.get(k), row.get(k)] for k in sorted(set(before) | set(row)) if before.get(k) != row.get(k)}
+                changes.append({"op": "changed", "id": id_, "changes": diff})
+            else:
+                self.counts["unchanged"] += 1
+            updates.append((id_, digest, self.run, json.dumps(row, ensure_ascii=False)))
+        for change in changes:
+            self.counts[change["op"]] += 1
+        self.db.executemany("INSERT OR REPLACE INTO snapshot (id, hash, seen, row) VALUES (?, ?, ?, ?)", updates)
+        return changes
+
+    def removed(self):
+        """Produit les monitorings absents de ce parcours (à appeler une fois le parcours complet)."""
+        for id_, row in self.db.execute("SELECT id, row FROM snapshot WHERE seen < ? ORDER BY id", (self.run,)):
+            self.counts["removed"] += 1
+            yield {"op": "removed", "id": id_, "node": json.loads(row)}
+
+    def commit(self):
+        self.db.execute("DELETE FROM snapshot WHERE seen < ?", (self.run,))
+        self.db.execute("COMMIT")
+        self.db.close()
+
+    def abort(self):
+        self.db.execute("ROLLBACK")
+        self.db.close()
+
+
+def snapshot_monitorings(path, output="-", dev=False, verbose=False, createdAtGt=None, createdAtLt=None,
+                         shards=None, concurrency=DEFAULT_CONCURRENCY, fields=None):
+    """Parcourt les monitorings et écrit en NDJSON les ajouts, modifications et suppressions
+    depuis le snapshot précédent (`path`), qui est ensuite remplacé par l'état courant.
+
+    Le premier parcours émet tous les monitorings en "added". La portée du snapshot
+    (createdAtGt, createdAtLt, fields) doit rester la même d'un parcours à l'autre,
+    sans quoi des monitorings hors portée passeraient pour supprimés.
+    """
+    if not createdAtGt:
+        raise SystemExit("❌ --snapshot nécessite --createdAtGt (portée fixe d'un parcours à l'autre)")
+    snapshot = MonitoringSnapshot(path, {"createdAtGt": createdAtGt, "createdAtLt": createdAtLt, "fields": fields})
+    stream = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    if shards:
+        pages = iter_monitorings_sharded(dev=dev, verbose=verbose, createdAtGt=createdAtGt, createdAtLt=createdAtLt,
+                                         shards=shards, concurrency=concurrency, fields=fields)
+    else:
+        pages = (nodes for nodes, _ in iter_monitoring_pages(dev=dev, verbose=verbose, createdAtGt=createdAtGt,
+                                                             createdAtLt=createdAtLt, fields=fields))
+
+    def emit(changes):
+        stream.write("".join(json.dumps(change, ensure_ascii=False) + "\n" for change in changes))
+
+    try:
+        for nodes in pages:
+            emit(snapshot.compare([flatten_node(node) for node in nodes]))
+        emit(snapshot.removed())
+        stream.flush()
+        snapshot.commit()
+    except GraphQLRequestError as e:
+        snapshot.abort()
+        err_console.print(f"[bold red]❌ Erreur API, snapshot inchangé :[/] {escape_markup(e)}")
+        err_console.print(e.response_text, highlight=False, markup=False)
+        raise SystemExit(1)
+    except BaseException:
+        snapshot.abort()
+        raise
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    counts = snapshot.counts
+    err_console.print(f"[bold green]✅ Snapshot {escape_markup(path)} :[/] ➕ {counts['added']} ajoutés, ✏️ {counts['changed']} modifiés, "
+                      f"➖ {counts['removed']} supprimés, {counts['unchanged']} inchangés")
+    return counts
+
+
+def query_store(path, output="-", fmt=None, where=(), createdAtGt=None, createdAtLt=None, limit=None, fields=None):
+    """Interroge la base locale (--store-query) et écrit le résultat, sans aucun appel à l'API."""
+    if not os.path.exists(path):
+        raise SystemExit(f"❌ Base introuvable : {path} (à créer avec --monitorings --output {path})")
+    if fmt in ("sqlite", "parquet") or (not fmt and output != "-" and output.endswith((".sqlite", ".db", ".parquet"))):
+        raise SystemExit("❌ --store-query écrit en ndjson ou csv")
+    columns = list(fields or MONITORING_COLUMNS)
+    store = MonitoringStore(path)
+    sink, stream = open_sink(output, fmt, columns=columns)
+    started = time.perf_counter()
+    total = 0
+    try:
+        batch = []
+        for row in store.query(where, createdAtGt, createdAtLt, limit, columns):
+            batch.append(row)
+            if len(batch) >= 1000:
+                sink.write(batch)
+                total += len(batch)
+                batch = []
+        sink.write(batch)
+        total += len(batch)
+    finally:
+        sink.close()
+        store.close()
+        if stream:
+            stream.close()
+    err_console.print(f"[bold green]✅ {total} monitorings[/] [dim]({(time.perf_counter() - started) * 1000:.1f} ms, base {escape_markup(path)})[/]")
+    return total
+
+
+def export_format(output, fmt=None):
+    """Format d'export effectif : `fmt` s'il est donné, sinon déduit de l'extension de `output`."""
+    if fmt:
+        return fmt
+    ext = os.path.splitext(output)[1].lstrip(".").lower()
+    return {"jsonl": "ndjson", "json": "ndjson", "db": "sqlite", "sqlite3": "sqlite"}.get(ext, ext if ext in EXPORT_FORMATS else "ndjson")
+
+
+def open_sink(output, fmt=None, append=False, columns=None):
+    """Ouvre le sink d'export pour `output` ('-' = stdout), format déduit de l'extension par défaut.
+
+    Avec append=True, les fichiers NDJSON/CSV sont complétés au lieu d'être écrasés
+    (sans nouvel en-tête CSV si le fichier existant n'est pas vide).
+    `columns` restreint les colonnes CSV/Parquet/SQLite (projection --fields). Le
+    format sqlite alimente une base MonitoringStore (.sqlite, .db).
+    Retourne (sink, fichier à fermer ou None).
+    """
+    columns = list(columns or MONITORING_COLUMNS)
+    fmt = export_format(output, fmt)
+    if fmt in ("parquet", "sqlite"):
+        if output == "-":
+            raise SystemExit(f"❌ Le format {fmt} nécessite un fichier de sortie")
+        return (ParquetSink(output, columns) if fmt == "parquet" else MonitoringStore(output, columns)), None
+    header = not (append and output != "-" and os.path.exists(output) and os.path.getsize(output) > 0)
+    stream = sys.stdout if output == "-" else open(output, "a" if append else "w", encoding="utf-8", newline="")
+    sink = CSVSink(stream, columns, header=header) if fmt == "csv" else NDJSONSink(stream)
+    return sink, (None if stream is sys.stdout else stream)
+
+
+def export_monitorings(output, fmt=None, dev=False, verbose=False, limit=None, createdAtGt=None,
+                       shards=None, createdAtLt=None, concurrency=DEFAULT_CONCURRENCY, fields=None):
+    """Exporte les monitorings page par page vers un sink NDJSON/CSV/Parquet, à mémoire constante.
+
+    Avec `shards`, l'export passe par iter_monitorings_sharded (fenêtres en parallèle).
+    `createdAtLt` borne l'export dans les deux cas.
+    """
+    sink, stream = open_sink(output, fmt, columns=fields)
+    total = 0
+    if shards:
+        pages = iter_monitorings_sharded(dev=dev, verbose=verbose, createdAtGt=createdAtGt, createdAtLt=createdAtLt,
+                                         shards=shards, concurrency=concurrency, limit=limit, fields=fields)
+    else:
+        pages = (nodes for nodes, _ in iter_monitoring_pages(dev=dev, verbose=verbose, limit=limit, createdAtGt=createdAtGt,
+                                                             createdAtLt=createdAtLt, fields=fields))
+    try:
+        for nodes in pages:
+            sink.write([flatten_node(node) for node in nodes])
+            total += len(nodes)
+    except GraphQLRequestError as e:
+        err_console.print(f"[bold red]❌ Erreur API après {total} monitorings :[/] {escape_markup(e)}")
+        err_console.print(e.response_text, highlight=False, markup=False)
+        raise SystemExit(1)
+    finally:
+        sink.close()
+        if stream:
+            stream.close()
+    err_console.print(f"[bold green]✅ {total} monitorings exportés.[/]")
+    return total
+
+
+def load_sync_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_sync_state(path, state):
+    """Écrit l'état de synchro de façon atomique (fichier temporaire + rename)."""
+    state["updatedAt"] = datetime.now().isoformat(timespec="seconds")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def sync_monitorings(state_path, output="-", fmt=None, dev=False, verbose=False, limit=None, createdAtGt=None, fields=None):
+    """Synchronisation incrémentale et reprenable des monitorings.
+
+    Après chaque page écrite, le fichier d'état enregistre l'endCursor et le plus
+    grand createdAt vu. Une exécution interrompue (crash, --limit) reprend au
+    dernier curseur ; une exécution terminée sert de point de départ à la suivante,
+    qui ne récupère que les monitorings créés depuis. Une page écrite mais pas
+    encore checkpointée peut être réécrite à la reprise.
+    """
+    state = load_sync_state(state_path)
+    after = None
+    if state.get("endCursor"):
+        createdAtGt = state["createdAtGt"]
+        after = state["endCursor"]
+        err_console.print(f"[yellow]↩️ Reprise de la synchro au curseur {escape_markup(after)} (createdAtGt={escape_markup(createdAtGt)})[/]")
+    elif state.get("maxCreatedAt"):
+        createdAtGt = state["maxCreatedAt"]
+    elif not createdAtGt:
+        createdAtGt = datetime.now().strftime("%Y-%m-%dT00:00:00Z")
+    state["createdAtGt"] = createdAtGt
+    max_created_at = state.get("maxCreatedAt")
+
+    sink, stream = open_sink(output, fmt, append=True, columns=fields)
+    total = 0
+    completed = False
+    try:
+        for nodes, page_info in iter_monitoring_pages(dev=dev, verbose=verbose, limit=limit, createdAtGt=createdAtGt, after=after,
+                                                      fields=fields):
+            sink.write([flatten_node(node) for node in nodes])
+            total += len(nodes)
+            for node in nodes:
+                created_at = node.get("createdAt")
+                if created_at and (max_created_at is None or created_at > max_created_at):
+                    max_created_at = created_at
+            state["maxCreatedAt"] = max_created_at
+            state["endCursor"] = page_info.get("endCursor") if page_info.get("hasNextPage") else None
+            completed = not page_info.get("hasNextPage")
+            save_sync_state(state_path, state)
+    except GraphQLRequestError as e:
+        err_console.print(f"[bold red]❌ Erreur API après {total} monitorings, reprise possible au prochain lancement :[/] {escape_markup(e)}")
+        err_console.print(e.response_text, highlight=False, markup=False)
+        raise SystemExit(1)
+    finally:
+        sink.close()
+        if stream:
+            stream.close()
+
+    if completed or (total == 0 and not after):
+        # Synchro terminée : la prochaine exécution part du dernier createdAt vu
+        state["endCursor"] = None
+        if max_created_at:
+            state["createdAtGt"] = max_created_at
+        save_sync_state(state_path, state)
+    err_console.print(f"[bold green]✅ {total} monitorings synchronisés[/] (état : {escape_markup(state_path)})")
+    return total
+
+
+def paginate_monitorings(dev=False, verbose=False, limit=None, createdAtGt=None, render="auto", fields=None, createdAtLt=None):
+    total = 0
+    try:
+        for nodes, page_info in iter_monitoring_pages(dev=dev, verbose=verbose, limit=limit, createdAtGt=createdAtGt, render=render,
+                                                      createdAtLt=createdAtLt, fields=fields):
+            for node in nodes:
+                flat_node = flatten_node(node)
+                # Affichage sur une seule ligne : clé: valeur séparés par un espace
+                console.print(" ".join(f"{k}: {v}" for k, v in flat_node.items()), markup=False)
+            total += len(nodes)
+    except GraphQLRequestError as e:
+        console.print(f"[bold red]❌ {escape_markup(e)}[/]")
+        raise SystemExit(1)
+
+    console.print(f"[bold green]✅ {total} monitorings récupérés.[/]")
+
+
+def _lookup_kind(field):
+    return "domains" if field in DOMAIN_FIELDS else "userSafebrands"
+
+
+def build_custom_selection(field, value, alias=None, variable=None):
+    """Construit la sélection racine d'un lookup (domains ou userSafebrands).
+
+    Retourne la valeur normalisée (clientNumber complété) et le texte de la sélection,
+    préfixée par `alias:` si un alias est fourni (requêtes groupées). Avec `variable`,
+    la valeur est référencée par $variable au lieu d'être écrite dans le document.
+    """
+    if field == "clientNumber" and len(value) < 8:
+        value = value.zfill(10) + "-1"
+    literal = f"${variable}" if variable else json.dumps(value, ensure_ascii=False)
+    prefix = f"{alias}: " if alias else ""
+
+    if field in DOMAIN_FIELDS:
+        selection = f"""
+            {prefix}domains({field}: {literal}) {{
                 nodes {{
                     account {{
                         id
@@ -214,14 +2065,11 @@ def query_custom(field, value, dev=False, verbose=False):
                         company
                     }}
                 }}
-            }}
-        }}
-        """
+            }}"""
     else:
-        query = f"""
-        query {{
-            userSafebrands(findUserInput: {{
-                {field}: "{value}"
+        selection = f"""
+            {prefix}userSafebrands(findUserInput: {{
+                {field}: {literal}
             }}) {{
                 id
                 clientNumber
@@ -242,13 +2090,640 @@ def query_custom(field, value, dev=False, verbose=False):
                     company
                     parent {{ id clientNumber }}
                 }}
-            }}
+            }}"""
+    return value, selection
+
+
+def build_custom_query(field, value):
+    """Construit la requête de lookup pour un couple champ/valeur.
+
+    Retourne la valeur normalisée (clientNumber complété) et le document GraphQL.
+    """
+    value, selection = build_custom_selection(field, value)
+    return value, f"""
+        query {{{selection}
         }}
         """
-    query_graphql(url, query, verbose)
+
+
+def build_custom_operation(field, value):
+    """Variante paramétrée de build_custom_query : le document ne dépend que du champ.
+
+    Retourne (valeur normalisée, document, variables) ; utilisée en mode APQ, où un
+    même document (donc un même hash) sert pour toutes les valeurs.
+    """
+    value, selection = build_custom_selection(field, value, variable="value")
+    return value, f"""
+        query ($value: String!) {{{selection}
+        }}
+        """, {"value": value}
+
+
+def build_batch_query(pairs):
+    """Regroupe plusieurs lookups dans un seul document GraphQL via des alias.
+
+    Chaque lookup devient `u<i>: userSafebrands(...)` ou `d<i>: domains(...)`.
+    Retourne le document et la liste des alias, dans l'ordre de `pairs`.
+    """
+    aliases = []
+    selections = []
+    for i, (field, value) in enumerate(pairs):
+        alias = f"{_lookup_kind(field)[0]}{i}"
+        _, selection = build_custom_selection(field, value, alias)
+        aliases.append(alias)
+        selections.append(selection)
+    return "query {" + "".join(selections) + "\n}\n", aliases
+
+
+def build_batch_operation(pairs):
+    """Variante paramétrée de build_batch_query : chaque valeur passe par $v<i>.
+
+    Retourne (document, alias, variables) ; le document ne dépend que de la suite des
+    champs, si bien qu'en mode APQ un même hash resert pour tous les lots de même forme.
+    """
+    aliases = []
+    selections = []
+    variables = {}
+    for i, (field, value) in enumerate(pairs):
+        alias = f"{_lookup_kind(field)[0]}{i}"
+        variables[f"v{i}"], selection = build_custom_selection(field, value, alias, variable=f"v{i}")
+        aliases.append(alias)
+        selections.append(selection)
+    signature = ", ".join(f"${name}: String!" for name in variables)
+    return f"query ({signature}) {{" + "".join(selections) + "\n}\n", aliases, variables
+
+
+def split_batch_response(data, pairs, aliases):
+    """Redécoupe la réponse d'une requête groupée en un enregistrement par lookup.
+
+    Les erreurs dont le `path` commence par un alias sont rattachées à ce lookup,
+    les autres (ex: complexité dépassée) à tous les lookups du lot.
+    """
+    results = data.get("data") or {}
+    known_aliases = set(aliases)
+    alias_errors = {}
+    shared_errors = []
+    for error in data.get("errors") or []:
+        path = error.get("path") or []
+        if path and path[0] in known_aliases:
+            alias_errors.setdefault(path[0], []).append(error)
+        else:
+            shared_errors.append(error)
+
+    records = []
+    for (field, value), alias in zip(pairs, aliases):
+        record = {"field": field, "value": value, "data": {_lookup_kind(field): results.get(alias)}}
+        errors = alias_errors.get(alias, []) + shared_errors
+        if errors:
+            record["errors"] = errors
+        records.append(record)
+    return records
+
+
+def iter_batches(pairs, batch_size=None):
+    """Découpe un flux de lookups en lots pour build_batch_query.
+
+    Sans `batch_size`, un lot est fermé quand la somme des complexités estimées
+    (LOOKUP_COMPLEXITY) dépasserait MAX_QUERY_COMPLEXITY, ou à MAX_BATCH_SIZE lookups.
+    """
+    batch = []
+    cost = 0
+    for field, value in pairs:
+        lookup_cost = LOOKUP_COMPLEXITY[_lookup_kind(field)]
+        if batch_size:
+            full = len(batch) >= batch_size
+        else:
+            full = len(batch) >= MAX_BATCH_SIZE or cost + lookup_cost > MAX_QUERY_COMPLEXITY
+        if batch and full:
+            yield batch
+            batch = []
+            cost = 0
+        batch.append((field, value))
+        cost += lookup_cost
+    if batch:
+        yield batch
+
+
+def query_custom(field, value, dev=False, verbose=False, render="auto"):
+    url = api_url(dev)
+    kind = _lookup_kind(field)
+    if get_apq():
+        value, query, variables = build_custom_operation(field, value)
+    else:
+        (value, query), variables = build_custom_query(field, value), None
+    return query_graphql(url, query, verbose, variables=variables, cost_key=kind, unit_cost=LOOKUP_COMPLEXITY[kind],
+                         cache_kind=kind, render=render)
+
+
+def diff_structures(a, b, path=""):
+    """Différences entre deux documents JSON, en profondeur.
+
+    Produit des tuples (chemin, nature, valeur a, valeur b), nature parmi "type"
+    (types différents), "missing" (clé ou élément présent d'un seul côté, valeur
+    None de l'autre), "length" (listes de tailles différentes) et "value".
+    """
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in list(a) + [k for k in b if k not in a]:
+            child = f"{path}.{key}" if path else str(key)
+            if key not in b:
+                yield child, "missing", a[key], None
+            elif key not in a:
+                yield child, "missing", None, b[key]
+            else:
+                yield from diff_structures(a[key], b[key], child)
+    elif isinstance(a, list) and isinstance(b, list):
+        for index, (item_a, item_b) in enumerate(zip(a, b)):
+            yield from diff_structures(item_a, item_b, f"{path}[{index}]")
+        if len(a) != len(b):
+            yield path, "length", len(a), len(b)
+    elif type(a) is not type(b) and not (isinstance(a, (int, float)) and isinstance(b, (int, float))):
+        yield path, "type", a, b
+    elif a != b:
+        yield path, "value", a, b
+
+
+def fan_out(fetch):
+    """Exécute fetch(dev) pour prod et dev en parallèle ; retourne {env: (résultat ou erreur, secondes)}.
+
+    La durée totale est celle de l'environnement le plus lent, pas la somme des deux.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed(dev):
+        started = time.perf_counter()
+        try:
+            result = fetch(dev)
+        except GraphQLRequestError as e:
+            result = e
+        return result, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {env: pool.submit(timed, dev) for env, dev in (("prod", False), ("dev", True))}
+        return {env: future.result() for env, future in futures.items()}
+
+
+def report_differences(results, label, output=None, started=None):
+    """Affiche (ou écrit en NDJSON sur `output`) les différences prod/dev ; retourne leur nombre."""
+    (prod, prod_s), (dev, dev_s) = results["prod"], results["dev"]
+    timing = f"prod {prod_s * 1000:.0f} ms, dev {dev_s * 1000:.0f} ms"
+    if started is not None:
+        timing += f", total {(time.perf_counter() - started) * 1000:.0f} ms"
+    if isinstance(prod, GraphQLRequestError) or isinstance(dev, GraphQLRequestError):
+        diffs = [("", "error", str(prod) if isinstance(prod, GraphQLRequestError) else None,
+                  str(dev) if isinstance(dev, GraphQLRequestError) else None)]
+    else:
+        diffs = diff_structures(prod, dev)
+    stream = open(output, "w", encoding="utf-8") if output and output != "-" else (sys.stdout if output else None)
+    count = 0
+    try:
+        for path, kind, value_prod, value_dev in diffs:
+            count += 1
+            if stream:
+                stream.write(json.dumps({"path": path, "kind": kind, "prod": value_prod, "dev": value_dev}, ensure_ascii=False) + "\n")
+            elif count <= COMPARE_MAX_SHOWN:
+                console.print(f"[yellow]≠ {escape_markup(path or '(racine)')}[/] [dim]{kind}[/] prod: {escape_markup(json.dumps(value_prod, ensure_ascii=False))} "
+                              f"│ dev: {escape_markup(json.dumps(value_dev, ensure_ascii=False))}", highlight=False)
+    finally:
+        if stream and stream is not sys.stdout:
+            stream.close()
+    if count > COMPARE_MAX_SHOWN and not stream:
+        console.print(f"[dim]… {count - COMPARE_MAX_SHOWN} autres différences (--output pour la liste complète)[/]")
+    if count:
+        err_console.print(f"[bold yellow]⚠️ {escape_markup(label)} : {count} différence(s) entre prod et dev[/] [dim]({timing})[/]")
+    else:
+        err_console.print(f"[bold green]✅ {escape_markup(label)} : réponses identiques en prod et dev[/] [dim]({timing})[/]")
+    return count
+
+
+def compare_custom(field, value, verbose=False, output=None):
+    """Envoie le même lookup à prod et dev en parallèle et compare data/errors (sans le cache)."""
+    kind = _lookup_kind(field)
+    value, query = build_custom_query(field, value)
+    if verbose:
+        console.print("[bold green]📤 Requête GraphQL envoyée (prod et dev) :[/]")
+        console.print_code(query, "graphql")
+
+    def fetch(dev):
+        data = post_graphql(api_url(dev), query, cost_key=kind, unit_cost=LOOKUP_COMPLEXITY[kind])
+        # extensions (complexité facturée...) varie d'un environnement à l'autre : ignoré
+        return {"data": data.get("data"), "errors": [error.get("message") for error in data.get("errors") or []]}
+
+    started = time.perf_counter()
+    return report_differences(fan_out(fetch), f"{field} {value}", output, started)
+
+
+def compare_monitorings(verbose=False, limit=None, createdAtGt=None, fields=None, output=None):
+    """Parcourt les monitorings en prod et en dev en parallèle et compare les nodes par id.
+
+    Les nodes des deux environnements sont gardés en mémoire (borner avec --limit).
+    """
+    def fetch(dev):
+        rows = {}
+        for nodes, _ in iter_monitoring_pages(dev=dev, verbose=verbose, limit=limit, createdAtGt=createdAtGt, fields=fields):
+            for node in nodes:
+                row = flatten_node(node)
+                rows[str(row.get("id"))] = row
+        return {"monitorings": rows}
+
+    started = time.perf_counter()
+    return report_differences(fan_out(fetch), "monitorings", output, started)
+
+
+def read_bulk_pairs(source, field=None):
+    """Lit les couples (champ, valeur) d'un fichier ou de stdin ("-").
+
+    Une ligne par lookup : "champ valeur", ou seulement la valeur si `field` est fourni.
+    Les lignes vides et les commentaires (#) sont ignorés.
+    """
+    stream = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if field:
+                yield field, line
+                continue
+            parts = line.split(None, 1)
+            if len(parts) != 2:
+                err_console.print(f"[yellow]⚠️ Ligne ignorée (attendu: champ valeur) : {escape_markup(line)}[/]", highlight=False)
+                continue
+            yield parts[0], parts[1].strip()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _bulk_lookup(url, batch):
+    """Résout un lot de lookups (une requête, groupée par alias si plusieurs).
+
+    Les lookups présents dans le cache sont servis sans requête ; les autres sont
+    mis en cache individuellement, sous la clé de leur requête unitaire.
+    """
+    cache = get_cache()
+    cached = {}
+    if cache:
+        for i, (field, value) in enumerate(batch):
+            hit = cache.get(cache_key(url, build_custom_query(field, value)[1]))
+            if hit is not None:
+                cached[i] = {"field": field, "value": value, "data": hit.get("data"), "cached": True}
+    misses = [pair for i, pair in enumerate(batch) if i not in cached]
+
+    # En mode APQ, les valeurs passent en variables : quelques documents (donc hashes) stables
+    # au lieu d'un document par valeur, qui coûterait plus d'octets qu'il n'en économise
+    apq = get_apq()
+    try:
+        if len(misses) == 1:
+            field, value = misses[0]
+            kind = _lookup_kind(field)
+            if apq:
+                _, query, variables = build_custom_operation(field, value)
+                data = post_graphql(url, query, variables, cost_key=kind, unit_cost=LOOKUP_COMPLEXITY[kind])
+                if cache and not data.get("errors"):
+                    cache.put(cache_key(url, build_custom_query(field, value)[1]), kind, data)
+            else:
+                _, query = build_custom_query(field, value)
+                data = post_graphql(url, query, cost_key=kind, unit_cost=LOOKUP_COMPLEXITY[kind], cache_kind=kind)
+            record = {"field": field, "value": value, "data": data.get("data")}
+            if data.get("errors"):
+                record["errors"] = data["errors"]
+            fetched = [record]
+        elif misses:
+            if apq:
+                query, aliases, variables = build_batch_operation(misses)
+            else:
+                (query, aliases), variables = build_batch_query(misses), None
+            kinds = sorted({_lookup_kind(field) for field, _ in misses})
+            unit_cost = sum(LOOKUP_COMPLEXITY[kind] for kind in kinds) / len(kinds)
+            data = post_graphql(url, query, variables, cost_key="+".join(kinds), units=len(misses), unit_cost=unit_cost)
+            fetched = split_batch_response(data, misses, aliases)
+            if cache:
+                for record in fetched:
+                    if "errors" not in record:
+                        _, single_query = build_custom_query(record["field"], record["value"])
+                        cache.put(cache_key(url, single_query), _lookup_kind(record["field"]), {"data": record["data"]})
+        else:
+            fetched = []
+    except GraphQLRequestError as e:
+        fetched = [{"field": field, "value": value, "error": str(e)} for field, value in misses]
+
+    fetched = iter(fetched)
+    return [cached[i] if i in cached else next(fetched) for i in range(len(batch))]
+
+
+def query_custom_bulk(pairs, dev=False, concurrency=DEFAULT_CONCURRENCY, batch_size=None, out=None):
+    """Exécute un lot de lookups query_custom avec une concurrence bornée.
+
+    Les lookups sont regroupés en requêtes à alias (voir iter_batches ; batch_size=1
+    désactive le regroupement). Chaque résultat est écrit en NDJSON sur `out` dès
+    qu'il arrive (ordre non garanti). Au plus 2 × concurrency requêtes sont en
+    attente, l'entrée est lue au fil de l'eau.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    url = api_url(dev)
+    out = out or sys.stdout
+    total = failed = 0
+
+    def emit(futures):
+        nonlocal total, failed
+        for future in futures:
+            for record in future.result():
+                total += 1
+                if "error" in record or "errors" in record:
+                    failed += 1
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = set()
+        for batch in iter_batches(pairs, batch_size):
+            pending.add(pool.submit(_bulk_lookup, url, batch))
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                emit(done)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            emit(done)
+
+    err_console.print(f"[bold green]✅ {total} lookups traités[/] ([red]{failed} en erreur[/])")
+    return total, failed
+
+
+def normalize_client_number(value):
+    """Numéro client sous la forme des lookups userSafebrands (complété comme build_custom_selection)."""
+    value = value.strip()
+    return value.zfill(10) + "-1" if len(value) < 8 else value
+
+
+def crawl_account_hierarchy(seeds, dev=False, concurrency=DEFAULT_CONCURRENCY, batch_size=None, max_depth=None, verbose=False):
+    """Remonte la hiérarchie des comptes (account.parent) depuis des numéros client, en largeur.
+
+    Chaque niveau est résolu en lookups userSafebrands groupés par alias (iter_batches)
+    et exécutés en parallèle ; les parents découverts forment le niveau suivant. La
+    table `accounts` sert de mémo : un compte partagé par plusieurs branches (revendeur
+    commun) n'est demandé qu'une fois, et le cache local sert les exécutions suivantes.
+    Le schéma n'expose que le parent d'un compte : l'arbre obtenu relie les comptes de
+    départ à leurs ancêtres. Retourne {numéro client: compte ou None si introuvable}.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+
+    url = api_url(dev)
+    accounts = {}
+    frontier = list(dict.fromkeys(normalize_client_number(seed) for seed in seeds))
+    seen = set(frontier)
+    depth = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while frontier and (max_depth is None or depth <= max_depth):
+            if verbose:
+                err_console.print(f"[blue]🌳 Niveau {depth} : {len(frontier)} compte(s) à résoudre[/]")
+            parents = []
+            batches = iter_batches((("clientNumber", number) for number in frontier), batch_size)
+            for records in pool.map(partial(_bulk_lookup, url), batches):
+                for record in records:
+                    number = normalize_client_number(record["value"])
+                    user = (record.get("data") or {}).get("userSafebrands")
+                    if user is None or "error" in record:
+                        accounts[number] = None
+                        err_console.print(f"[yellow]⚠️ Compte {number} introuvable : {escape_markup(record.get('error') or record.get('errors') or 'aucun utilisateur')}[/]",
+                                          highlight=False)
+                        continue
+                    account = user.get("account") or {}
+                    parent = (account.get("parent") or {}).get("clientNumber")
+                    parent = normalize_client_number(parent) if parent else None
+                    accounts[number] = {"clientNumber": number, "id": account.get("id"), "company": account.get("company"), "parent": parent}
+                    if parent and parent not in seen:
+                        seen.add(parent)
+                        parents.append(parent)
+            frontier = parents
+            depth += 1
+    return accounts
+
+
+def account_children(accounts):
+    """Liste d'adjacence parent → enfants, et racines (sans parent connu)."""
+    children = {}
+    roots = []
+    for number, account in accounts.items():
+        if account is None:
+            continue
+        if account["parent"] and accounts.get(account["parent"]):
+            children.setdefault(account["parent"], []).append(number)
+        else:
+            roots.append(number)
+    return children, sorted(roots)
+
+
+def write_account_hierarchy(accounts, output="-", fmt="tree"):
+    """Écrit la hiérarchie : arbre indenté (tree), JSON imbriqué (json) ou une ligne par compte (ndjson)."""
+    children, roots = account_children(accounts)
+    stream = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+
+    def subtree(number, visited):
+        node = dict(accounts[number])
+        if number not in visited:
+            node["children"] = [subtree(child, visited | {number}) for child in sorted(children.get(number, []))]
+        return node
+
+    def lines(number, prefix, last, visited):
+        account = accounts[number]
+        branch = "" if prefix is None else prefix + ("└── " if last else "├── ")
+        yield f"{branch}{number}  {account.get('company') or ''}".rstrip()
+        if number in visited:
+            return
+        kids = sorted(children.get(number, []))
+        child_prefix = "" if prefix is None else prefix + ("    " if last else "│   ")
+        for i, child in enumerate(kids):
+            yield from lines(child, child_prefix, i == len(kids) - 1, visited | {number})
+
+    try:
+        if fmt == "ndjson":
+            for number, account in accounts.items():
+                if account is not None:
+                    stream.write(json.dumps(account, ensure_ascii=False) + "\n")
+        elif fmt == "json":
+            stream.write(json.dumps([subtree(root, set()) for root in roots], ensure_ascii=False, indent=2) + "\n")
+        else:
+            for root in roots:
+                stream.write("\n".join(lines(root, None, True, set())) + "\n")
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    found = sum(account is not None for account in accounts.values())
+    err_console.print(f"[bold green]✅ {found} comptes[/], {len(roots)} racine(s) ([red]{len(accounts) - found} introuvables[/])")
+
+
+_LDH_LABEL_RE = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$")
+
+
+def normalize_domain(name):
+    """Forme canonique d'un nom de domaine : minuscules, sans point final, IDN en punycode.
+
+    Retourne (forme ASCII, forme Unicode), ou None si le nom est invalide : le codec idna
+    étant permissif, chaque label ASCII est vérifié selon les règles LDH (1 à 63 caractères,
+    lettres, chiffres et tirets, sans tiret en tête ni en fin, pas de label vide hormis le
+    point final de la racine).
+    """
+    name = name.strip().lower()
+    if name.endswith("."):
+        name = name[:-1]
+    if not name:
+        return None
+    try:
+        ascii_name = name.encode("idna").decode("ascii")
+        unicode_name = ascii_name.encode("ascii").decode("idna")
+    except UnicodeError:
+        return None
+    if len(ascii_name) > 253 or not all(_LDH_LABEL_RE.match(label) for label in ascii_name.split(".")):
+        return None
+    return ascii_name, unicode_name
+
+
+class DomainIndex:
+    """Index SQLite persistant domaine → compte, et compte → domaines (index sur client_number).
+
+    Un domaine résolu (compte trouvé ou non) est servi depuis l'index tant que son
+    entrée a moins de `ttl` secondes ; seuls les domaines inconnus ou périmés
+    repartent vers l'API.
+    """
+
+    def __init__(self, path=DOMAIN_INDEX_FILE, ttl=DOMAIN_INDEX_TTL):
+        import sqlite3
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS domains ("
+            " domain TEXT PRIMARY KEY, unicode TEXT NOT NULL, account_id TEXT, client_number TEXT, company TEXT,"
+            " resolved REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS domains_client_number ON domains (client_number)")
+
+    @staticmethod
+    def _account(row):
+        account_id, client_number, company = row
+        return {"id": account_id, "clientNumber": client_number, "company": company} if client_number else None
+
+    def lookup(self, domains):
+        """Entrées fraîches pour `domains` (formes ASCII) : {domaine: compte ou None}."""
+        found = {}
+        fresh_after = time.time() - self.ttl
+        domains = list(domains)
+        for start in range(0, len(domains), 500):
+            chunk = domains[start:start + 500]
+            for domain, *account in self.db.execute(
+                    f"SELECT domain, account_id, client_number, company FROM domains WHERE resolved >= ? AND domain IN ({', '.join('?' for _ in chunk)})",
+                    [fresh_after] + chunk):
+                found[domain] = self._account(account)
+        return found
+
+    def store(self, entries):
+        """Enregistre [(ascii, unicode, compte ou None)] résolus via l'API."""
+        now = time.time()
+        with self.db:
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO domains (domain, unicode, account_id, client_number, company, resolved) VALUES (?, ?, ?, ?, ?, ?)",
+                [(ascii_name, unicode_name, (account or {}).get("id"), (account or {}).get("clientNumber"), (account or {}).get("company"), now)
+                 for ascii_name, unicode_name, account in entries],
+            )
+
+    def domains_of(self, client_number):
+        """Index inverse : domaines connus d'un compte (tous âges confondus)."""
+        return [row[0] for row in self.db.execute("SELECT domain FROM domains WHERE client_number = ? ORDER BY domain", (client_number,))]
+
+    def close(self):
+        self.db.close()
+
+
+def read_domains(source):
+    """Lit une liste de domaines (un par ligne, ou au format --bulk "domainName valeur") ; '-' = stdin."""
+    for _, line in read_bulk_pairs(source, "domainName"):
+        yield line.split()[-1]
+
+
+def resolve_domains(names, dev=False, index_path=DOMAIN_INDEX_FILE, refresh=False, concurrency=DEFAULT_CONCURRENCY,
+                    batch_size=None, output="-"):
+    """Résout une liste de domaines vers leurs comptes, par tranches de RESOLVE_CHUNK.
+
+    Les noms sont normalisés (normalize_domain) et dédoublonnés ; ceux que l'index
+    connaît (moins de DOMAIN_INDEX_TTL, sauf refresh) ne coûtent aucune requête, les
+    autres partent en lookups domains groupés par alias et parallèles, puis alimentent
+    l'index. Une ligne NDJSON par domaine unique : domaine, forme Unicode, compte, source.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+
+    url = api_url(dev)
+    index = DomainIndex(index_path)
+    stream = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    seen = set()
+    counts = {"input": 0, "duplicates": 0, "invalid": 0, "index": 0, "api": 0, "unknown": 0, "errors": 0}
+
+    def resolve_chunk(chunk):
+        cached = {} if refresh else index.lookup(chunk)
+        misses = [domain for domain in chunk if domain not in cached]
+        resolved, failed = {}, set()
+        batches = iter_batches((("domainName", domain) for domain in misses), batch_size)
+        for records in pool.map(partial(_bulk_lookup, url), batches):
+            for record in records:
+                if "error" in record or "errors" in record:
+                    failed.add(record["value"])
+                    continue
+                nodes = ((record.get("data") or {}).get("domains") or {}).get("nodes") or []
+                resolved[record["value"]] = next((node.get("account") for node in nodes if node.get("account")), None)
+        index.store([(domain, chunk[domain], account) for domain, account in resolved.items()])
+        counts["index"] += len(cached)
+        counts["api"] += len(resolved)
+        counts["errors"] += len(failed)
+        lines = []
+        for domain, unicode_name in chunk.items():
+            if domain in failed:
+                lines.append({"domain": domain, "unicode": unicode_name, "error": "lookup en échec"})
+                continue
+            account = cached[domain] if domain in cached else resolved[domain]
+            counts["unknown"] += account is None
+            lines.append({"domain": domain, "unicode": unicode_name, "account": account,
+                          "source": "index" if domain in cached else "api"})
+        stream.write("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines))
+        stream.flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            chunk = {}
+            for name in names:
+                counts["input"] += 1
+                normalized = normalize_domain(name)
+                if normalized is None:
+                    counts["invalid"] += 1
+                    err_console.print(f"[yellow]⚠️ Domaine invalide ignoré : {escape_markup(name)}[/]", highlight=False)
+                    continue
+                if normalized[0] in seen:
+                    counts["duplicates"] += 1
+                    continue
+                seen.add(normalized[0])
+                chunk[normalized[0]] = normalized[1]
+                if len(chunk) >= RESOLVE_CHUNK:
+                    resolve_chunk(chunk)
+                    chunk = {}
+            if chunk:
+                resolve_chunk(chunk)
+    finally:
+        index.close()
+        if stream is not sys.stdout:
+            stream.close()
+    err_console.print(f"[bold green]✅ {len(seen)} domaines uniques[/] ({counts['duplicates']} doublons, {counts['invalid']} invalides) : "
+                      f"{counts['index']} depuis l'index, {counts['api']} via l'API, {counts['unknown']} sans compte, "
+                      f"[red]{counts['errors']} en erreur[/]")
+    return counts
 
 
 def main():
+    import argparse
+
     parser = argparse.ArgumentParser(description="CLI GraphQL Brandshelter", formatter_class=argparse.RawTextHelpFormatter)
     parser.add_argument("field", nargs="?", help="Champ à interroger (ex: loginName, clientNumber, domainName)")
     parser.add_argument("value", nargs="?", help="Valeur du champ")
@@ -257,15 +2732,130 @@ def main():
     parser.add_argument("--monitorings", action="store_true", help="Lister tous les monitorings (avec pagination)")
     parser.add_argument("--limit", type=int, help="Nombre maximum de monitorings à récupérer (avec --monitorings)")
     parser.add_argument("--createdAtGt", type=str, help="Date ISO8601 (ex: 2025-07-02T00:00:00Z) pour filtrer les monitorings créés après cette date (avec --monitorings)")
+    parser.add_argument("--createdAtLt", type=str, help="Date ISO8601 de fin (exclue) des monitorings parcourus\n(avec --shards, défaut: maintenant ; non pris en charge avec --sync / --compare)")
+    parser.add_argument("--shards", type=int, help="Découper [createdAtGt, createdAtLt] en N fenêtres paginées en parallèle\n(avec --monitorings --output, parallélisme: --concurrency)")
+    parser.add_argument("--output", metavar="FICHIER", help="Exporter les monitorings vers un fichier ('-' pour stdout) sans affichage terminal (avec --monitorings)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Format de --output (défaut: selon l'extension, sinon ndjson ;\nsqlite = base locale indexée pour --store-query, .sqlite/.db)")
+    parser.add_argument("--snapshot", metavar="FICHIER", help="Avec --monitorings --createdAtGt : changeset NDJSON (added/changed/removed) par rapport\nau snapshot précédent stocké dans ce fichier SQLite, puis mise à jour du snapshot (--output, défaut stdout)")
+    parser.add_argument("--compare", action="store_true", help="Envoyer le lookup (champ valeur) ou --monitorings à prod et dev en parallèle et\nafficher les différences de structure et de valeurs (NDJSON avec --output). Code retour 1 si différent")
+    parser.add_argument("--hierarchy", action="store_true", help="Remonter la hiérarchie des comptes (account.parent) depuis clientNumber VALEUR, ou depuis\nune liste de numéros client (--bulk FICHIER clientNumber), en largeur, lookups groupés et parallèles")
+    parser.add_argument("--hierarchy-format", choices=("tree", "json", "ndjson"), default="tree", help="Sortie de --hierarchy : arbre indenté, JSON imbriqué ou\nliste d'adjacence NDJSON (un compte et son parent par ligne) (défaut: tree, fichier: --output)")
+    parser.add_argument("--max-depth", type=int, help="Nombre maximum de niveaux de parents remontés par --hierarchy")
+    parser.add_argument("--resolve-domains", metavar="FICHIER", help="Résoudre une liste de domaines (un par ligne, '-' = stdin) vers leurs comptes :\nnormalisation (minuscules, IDN/punycode), dédoublonnage, lookups groupés et parallèles,\nindex local domaine → compte (seuls les domaines inconnus ou périmés vont à l'API). NDJSON sur --output")
+    parser.add_argument("--domain-index", default=DOMAIN_INDEX_FILE, help=f"Index SQLite de --resolve-domains / --account-domains (défaut: {DOMAIN_INDEX_FILE})")
+    parser.add_argument("--account-domains", metavar="CLIENTNUMBER", help="Lister les domaines connus de l'index pour un compte (index inverse, sans appel à l'API)")
+    parser.add_argument("--store-query", metavar="BASE", help="Interroger une base SQLite de monitorings (créée par --monitorings --output base.sqlite),\nsans appel à l'API. Filtres: --where, --createdAtGt, --createdAtLt, --limit ; sortie --output/--format")
+    parser.add_argument("--where", action="append", default=[], metavar="CHAMP=VALEUR", help="Filtre de --store-query, répétable (ET) : égalité, jokers * ?, null\n(ex: --where __typename=WebPageAndWhoisMonitoring --where active=true --where 'target=*.fr')")
+    parser.add_argument("--fields", help=f"Champs des monitorings à récupérer, séparés par des virgules (avec --monitorings ;\n"
+                                          f"{', '.join(MONITORING_REQUIRED_FIELDS)} toujours inclus). Requête réduite et pages plus grandes\n"
+                                          f"(disponibles: {', '.join(MONITORING_COLUMNS)})")
+    parser.add_argument("--sync", metavar="ETAT", help="Synchro incrémentale reprenable des monitorings, état (curseur, dernier createdAt)\nsauvegardé dans ce fichier après chaque page. Sortie NDJSON/CSV/SQLite complétée, parquet non pris en charge (--output, défaut stdout)")
+    parser.add_argument("--render", choices=RENDER_POLICIES, default="auto", help=f"Affichage des réponses : auto (complet sous {RENDER_FULL_MAX_BYTES // 1024} Ko, sinon résumé),\nnone, summary ou full (défaut: auto)")
+    parser.add_argument("--plain", action="store_true", help="Sortie texte brut, sans couleurs ni rich (aussi via BS_PLAIN=1)")
+    parser.add_argument("--no-cache", action="store_true", help="Ne pas utiliser le cache local des lookups")
+    parser.add_argument("--refresh", action="store_true", help="Ignorer le cache pour cette exécution (les réponses y sont réenregistrées)")
+    parser.add_argument("--cache-file", default=CACHE_FILE, help=f"Base SQLite du cache des lookups (défaut: {CACHE_FILE})")
+    parser.add_argument("--rate-budget", type=int, default=SAFE_COMPLEXITY, help=f"Budget de complexité par minute (défaut: {SAFE_COMPLEXITY})")
+    parser.add_argument("--rate-state", default=RATE_STATE_FILE, help="Fichier d'état du rate limiter, partagé entre processus\n('' pour un budget propre à ce processus)")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES, help=f"Reprises maximum d'une requête en échec transitoire (défaut: {MAX_RETRIES}, 0 = aucune)")
+    parser.add_argument("--apq", action="store_true", help="Automatic persisted queries : n'envoyer que le hash SHA-256 des documents\ndéjà enregistrés côté serveur (texte complet en cas d'absence)")
+    parser.add_argument("--apq-registry", action="store_true", help="Lister les documents GraphQL connus du projet et leur hash SHA-256")
+    parser.add_argument("--endpoint", metavar="URL", help="URL GraphQL à utiliser à la place de prod/dev (ex: serveur local bs_mock_server.py),\ndéfaut: variable BRANDSHELTER_API_URL (prod) ou BRANDSHELTER_API_URL_DEV (--dev)")
+    parser.add_argument("--metrics-out", metavar="FICHIER", help="Métriques par requête (connexion, TLS, premier octet, octets, complexité, reprises,\nattentes) agrégées en histogrammes, écrites à la fin : format Prometheus si .prom, JSON sinon ('-' = stderr)")
+    parser.add_argument("--http2", action="store_true", help="Multiplexer les requêtes en HTTP/2 (nécessite httpx[http2])")
+    parser.add_argument("--bulk", metavar="FICHIER", help="Lookups en masse depuis un fichier ('-' pour stdin), une ligne 'champ valeur'\n(ou seulement la valeur si le champ est passé en argument). Résultats en NDJSON sur stdout")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help=f"Nombre de requêtes en parallèle avec --bulk ou --shards (défaut: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--batch-size", type=int, help="Lookups regroupés par requête avec --bulk (défaut: selon le budget de complexité, 1 = pas de regroupement)")
 
     args = parser.parse_args()
+    if args.shards is not None and args.shards < 1:
+        parser.error("--shards doit être au moins 1")
+    if args.concurrency < 1:
+        parser.error("--concurrency doit être au moins 1")
+    if args.batch_size is not None and args.batch_size < 1:
+        parser.error("--batch-size doit être au moins 1")
+    if args.shards and not (args.monitorings and (args.output or args.snapshot)) or args.shards and (args.sync or args.compare):
+        parser.error("--shards s'utilise avec --monitorings --output (export) ou --monitorings --snapshot")
+    if args.createdAtLt and (args.sync or args.compare):
+        parser.error("--createdAtLt n'est pas pris en charge avec --sync ni --compare")
+    if args.sync and export_format(args.output or "-", args.format) == "parquet":
+        parser.error("--sync ne peut pas compléter un fichier parquet, utiliser ndjson, csv ou sqlite")
+    if args.plain:
+        LazyConsole.plain = True
+    configure_rate_limiter(path=args.rate_state or None, budget=args.rate_budget, verbose=args.verbose)
+    configure_retries(max_retries=args.retries, verbose=args.verbose)
+    if args.metrics_out:
+        configure_metrics(args.metrics_out, verbose=args.verbose)
+    configure_apq(enabled=args.apq)
+    if args.endpoint:
+        configure_endpoint(args.endpoint)
+    if args.compare and api_url(False) == api_url(True):
+        parser.error(f"--compare nécessite deux URL distinctes, prod et dev pointent vers {api_url(False)}\n"
+                     "(--endpoint à retirer, ou BRANDSHELTER_API_URL_DEV à définir)")
+    fields = parse_monitoring_fields(args.fields)
+    if args.bulk or (args.field and args.value and not args.monitorings) or args.hierarchy or args.resolve_domains:
+        configure_cache(args.cache_file, enabled=not args.no_cache, refresh=args.refresh)
 
-    if args.monitorings:
-        paginate_monitorings(dev=args.dev, verbose=args.verbose, limit=args.limit, createdAtGt=args.createdAtGt)
+    if args.apq_registry:
+        for name, document in known_documents().items():
+            console.print(f"{query_hash(document)}  {name}", highlight=False, markup=False)
+    elif args.compare and (args.monitorings or (args.field and args.value)):
+        get_session(http2=args.http2)
+        if args.monitorings:
+            differences = compare_monitorings(verbose=args.verbose, limit=args.limit, createdAtGt=args.createdAtGt, fields=fields,
+                                              output=args.output)
+        else:
+            differences = compare_custom(args.field, args.value, verbose=args.verbose, output=args.output)
+        sys.exit(1 if differences else 0)
+    elif args.store_query:
+        query_store(args.store_query, args.output or "-", args.format, where=args.where, createdAtGt=args.createdAtGt,
+                    createdAtLt=args.createdAtLt, limit=args.limit, fields=fields)
+    elif args.account_domains:
+        index = DomainIndex(args.domain_index)
+        for domain in index.domains_of(normalize_client_number(args.account_domains)):
+            console.print(domain, highlight=False, markup=False)
+        index.close()
+    elif args.resolve_domains:
+        get_session(http2=args.http2, pool_maxsize=max(POOL_MAXSIZE, args.concurrency))
+        resolve_domains(read_domains(args.resolve_domains), dev=args.dev, index_path=args.domain_index, refresh=args.refresh,
+                        concurrency=args.concurrency, batch_size=args.batch_size, output=args.output or "-")
+    elif args.hierarchy:
+        if args.bulk:
+            seeds = [value for field, value in read_bulk_pairs(args.bulk, args.field or "clientNumber") if field == "clientNumber"]
+        elif args.field == "clientNumber" and args.value:
+            seeds = [args.value]
+        else:
+            console.print("[bold red]❌ --hierarchy attend clientNumber VALEUR ou --bulk FICHIER (numéros client)[/]")
+            sys.exit(1)
+        get_session(http2=args.http2, pool_maxsize=max(POOL_MAXSIZE, args.concurrency))
+        accounts = crawl_account_hierarchy(seeds, dev=args.dev, concurrency=args.concurrency, batch_size=args.batch_size,
+                                           max_depth=args.max_depth, verbose=args.verbose)
+        write_account_hierarchy(accounts, args.output or "-", args.hierarchy_format)
+    elif args.bulk:
+        get_session(http2=args.http2, pool_maxsize=max(POOL_MAXSIZE, args.concurrency))
+        query_custom_bulk(read_bulk_pairs(args.bulk, args.field), dev=args.dev,
+                          concurrency=args.concurrency, batch_size=args.batch_size)
+    elif args.monitorings and args.snapshot:
+        get_session(http2=args.http2, pool_maxsize=max(POOL_MAXSIZE, args.concurrency))
+        snapshot_monitorings(args.snapshot, args.output or "-", dev=args.dev, verbose=args.verbose, createdAtGt=args.createdAtGt,
+                             createdAtLt=args.createdAtLt, shards=args.shards, concurrency=args.concurrency, fields=fields)
+    elif args.monitorings and args.sync:
+        get_session(http2=args.http2)
+        sync_monitorings(args.sync, args.output or "-", args.format, dev=args.dev, verbose=args.verbose, limit=args.limit, createdAtGt=args.createdAtGt,
+                         fields=fields)
+    elif args.monitorings and args.output:
+        get_session(http2=args.http2, pool_maxsize=max(POOL_MAXSIZE, args.concurrency))
+        export_monitorings(args.output, args.format, dev=args.dev, verbose=args.verbose, limit=args.limit, createdAtGt=args.createdAtGt,
+                           shards=args.shards, createdAtLt=args.createdAtLt, concurrency=args.concurrency, fields=fields)
+    elif args.monitorings:
+        get_session(http2=args.http2)
+        paginate_monitorings(dev=args.dev, verbose=args.verbose, limit=args.limit, createdAtGt=args.createdAtGt, render=args.render,
+                             fields=fields, createdAtLt=args.createdAtLt)
     elif args.field and args.value:
-        query_custom(args.field, args.value, dev=args.dev, verbose=args.verbose)
+        get_session(http2=args.http2)
+        query_custom(args.field, args.value, dev=args.dev, verbose=args.verbose, render=args.render)
     else:
-        console.print("[bold red]❌ Il faut spécifier --monitorings ou un champ + une valeur (ex: login fabrice.terrasson)[/]")
+        console.print("[bold red]❌ Il faut spécifier --monitorings ou un champ + une valeur (ex: login fabrice.terrasson) ou --bulk[/]")
         parser.print_help()
 
 
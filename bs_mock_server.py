@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Serveur GraphQL local imitant l'API BrandShelter, pour les tests de charge et benchmarks
+
+Sert des données synthétiques déterministes :
+- monitoringsSafebrands : pagination par curseur (first/after), filtres createdAtGt/createdAtLt
+- domains(domainName|domainHandle|...) : compte propriétaire du domaine
+- userSafebrands(findUserInput: {...}) : utilisateur, permissions et compte (avec parent)
+
+Reproduit le comportement de l'API qui compte pour bs_graphql_cli.py : latence
+configurable, complexité par requête (extensions.complexity, plafond par requête),
+budget de complexité par minute avec réponses 429 + Retry-After, automatic persisted
+queries, erreurs 503 aléatoires. Les compteurs sont exposés en JSON sur GET /stats.
+
+Usage:
+    python bs_mock_server.py --port 8765 --nodes 5000 --latency 50
+    python bs_graphql_cli.py --endpoint http://127.0.0.1:8765/graphql --monitorings --createdAtGt 2025-01-01T00:00:00Z
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_NODES = 5000
+DEFAULT_ACCOUNTS = 500
+NODES_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+NODES_STEP = timedelta(minutes=5)
+
+# Complexité : mêmes ordres de grandeur que l'API (100 nodes complets = 50007)
+NODE_COMPLEXITY = 500  # node avec tous les champs de MONITORINGS_QUERY
+BASE_COMPLEXITY = 7
+LOOKUP_COMPLEXITY = {"domains": 100, "userSafebrands": 500}
+MAX_QUERY_COMPLEXITY = 25000
+DEFAULT_BUDGET = 100000  # points par minute
+
+TYPENAMES = {
+    "LogoMonitoring": ("active", "domainNameMonitoringFolder"),
+    "ContentMonitoring": ("active", "domainNameMonitoringFolder"),
+    "DomainAudit": ("active", "domainNameMonitoringFolder"),
+    "DomainMonitoring": ("active", "domainNameMonitoringFolder"),
+    "SocialMediaMonitoring": ("active", "domainNameMonitoringFolder"),
+    "WebPageAndWhoisMonitoring": ("active", "target"),
+    "RegistrantSearch": ("active",),
+    "Analysis": ("active",),
+    "Consultation": ("active",),
+}
+BASE_FIELDS = ("id", "__typename", "referenceNumber", "createdAt")
+FULL_LEAVES = len(BASE_FIELDS) + sum(len(fields) for fields in TYPENAMES.values())
+
+ROOT_RE = re.compile(r"(?:(\w+)\s*:\s*)?\b(monitoringsSafebrands|domains|userSafebrands)\s*\(([^)]*)\)")
+ARG_RE = re.compile(r"(\w+)\s*:\s*(\"(?:[^\"\\]|\\.)*\"|\$\w+|-?\d+|null|true|false)")
+FRAGMENT_RE = re.compile(r"\.\.\.\s*on\s+(\w+)\s*\{([^}]*)\}")
+
+
+def _iso(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_iso(value):
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def make_node(index):
+    typenames = list(TYPENAMES)
+    typename = typenames[index % len(typenames)]
+    node = {
+        "id": str(index + 1),
+        "__typename": typename,
+        "referenceNumber": f"MON-{index + 1:08d}",
+        "createdAt": _iso(NODES_START + NODES_STEP * index),
+        "active": index % 7 != 0,
+        "domainNameMonitoringFolder": f"Dossier {index % 13}" if index % 5 else None,
+        "target": f"site-{index}.example",
+    }
+    return {k: v for k, v in node.items() if k in BASE_FIELDS or k in TYPENAMES[typename]}
+
+
+def make_account(number):
+    return {
+        "id": str(100000 + number),
+        "clientNumber": f"{number:010d}-1",
+        "company": f"Société {number}",
+        # Hiérarchie de comptes : le parent de n est n // 10, le compte 0 est la racine
+        "parent": None if number == 0 else {"id": str(100000 + number // 10), "clientNumber": f"{number // 10:010d}-1"},
+    }
+
+
+def node_selection(query):
+    """Champs demandés par node : (champs communs, {typename: champs du fragment})."""
+    start = query.find("nodes")
+    block = query[start:query.find("pageInfo", start)] if start >= 0 else ""
+    fragments = {t: set(re.findall(r"\w+", body)) for t, body in FRAGMENT_RE.findall(block)}
+    common = set(re.findall(r"\w+", FRAGMENT_RE.sub("", block)))
+    return [f for f in BASE_FIELDS if f in common], fragments
+
+
+class MockState:
+    """Données et compteurs du serveur, partagés par les threads de requêtes."""
+
+    def __init__(self, nodes=DEFAULT_NODES, accounts=DEFAULT_ACCOUNTS, latency=0.0, jitter=0.0,
+                 budget=DEFAULT_BUDGET, max_complexity=MAX_QUERY_COMPLEXITY, error_rate=0.0, apq=True):
+        self.nodes = [make_node(i) for i in range(nodes)]
+        self.created = [_parse_iso(node["createdAt"]) for node in self.nodes]
+        self.accounts = accounts
+        self.latency = latency
+        self.jitter = jitter
+        self.capacity = budget
+        self.rate = budget / 60.0
+        self.max_complexity = max_complexity
+        self.error_rate = error_rate
+        self.apq = apq
+        self.persisted = {}
+        self.lock = threading.Lock()
+        self.tokens = float(budget)
+        self.updated = time.monotonic()
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "complexity": 0, "nodes": 0, "lookups": 0,
+                      "apq_hits": 0, "apq_misses": 0}
+
+    def count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def spend(self, cost):
+        """Débite le budget ; retourne (accepté, restant, secondes avant que `cost` soit disponible)."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost or self.tokens >= self.capacity:
+                self.tokens -= cost
+                return True, max(0.0, self.tokens), 0.0
+            return False, self.tokens, (cost - self.tokens) / self.rate
+
+    def account_for(self, value):
+        return make_account(zlib.crc32(value.encode("utf-8")) % self.accounts)
+
+    def monitorings(self, args, query):
+        first = min(int(args.get("first") or 100), 100)
+        offset = int(args["after"].split(":")[1]) if args.get("after") else 0
+        gt = _parse_iso(args["createdAtGt"]) if args.get("createdAtGt") else None
+        lt = _parse_iso(args["createdAtLt"]) if args.get("createdAtLt") else None
+        common, fragments = node_selection(query)
+        # Nodes triés par createdAt : début de la fenêtre par dichotomie
+        index = max(offset, bisect.bisect_right(self.created, gt) if gt else 0)
+        end = bisect.bisect_left(self.created, lt) if lt else len(self.nodes)
+        page = []
+        for node in self.nodes[index:min(end, index + first)]:
+            extra = fragments.get(node["__typename"], ())
+            page.append({k: v for k, v in node.items() if k in common or k in extra})
+        index += len(page)
+        has_next = index < end
+        leaves = len(common) + sum(len(fields & set(TYPENAMES.get(t, ()))) for t, fields in fragments.items())
+        cost = first * NODE_COMPLEXITY * leaves // FULL_LEAVES
+        return {"nodes": page, "pageInfo": {"hasNextPage": has_next, "endCursor": f"cursor:{index}"}}, cost, len(page)
+
+    def domains(self, args):
+        value = next((v for k, v in args.items() if v), "")
+        return {"nodes": [{"account": {k: v for k, v in self.account_for(value).items() if k != "parent"}}]}
+
+    def user(self, args):
+        field, value = next(((k, v) for k, v in args.items() if v), ("login", ""))
+        if field == "clientNumber":
+            number = value.split("-")[0]
+            if not number.isdigit() or int(number) >= self.accounts:
+                return None
+            account = make_account(int(number))
+        else:
+            account = self.account_for(value)
+        return {
+            "id": str(zlib.crc32(value.encode("utf-8"))),
+            "clientNumber": account["clientNumber"],
+            "login": value if field in ("login", "loginName") else f"user{account['id']}",
+            "authorization": {"permissions": [{"action": "read", "department": {"id": "1", "name": "Legal"}, "id": "1",
+                                               "requireApproval": False, "requireTan": False, "subjectClass": "Domain"}]},
+            "account": account,
+        }
+
+    def execute(self, query, variables):
+        """Résout les sélections racines du document ; retourne (data, complexité)."""
+        data = {}
+        cost = BASE_COMPLEXITY
+        for alias, root, raw_args in ROOT_RE.findall(query):
+            args = {}
+            for name, literal in ARG_RE.findall(raw_args):
+                if name == "findUserInput":
+                    continue
+                args[name] = variables.get(literal[1:]) if literal.startswith("$") else json.loads(literal)
+            if root == "monitoringsSafebrands":
+                data[alias or root], page_cost, count = self.monitorings(args, query)
+                cost += page_cost
+                self.count(nodes=count)
+            else:
+                data[alias or root] = self.domains(args) if root == "domains" else self.user(args)
+                cost += LOOKUP_COMPLEXITY[root]
+                self.count(lookups=1)
+        return data, cost
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme l'API réelle
+    disable_nagle_algorithm = True  # en-têtes et corps écrits séparément : pas d'attente d'ACK différé
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, body, headers=None):
+        raw = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.state.lock:
+                return self._reply(200, dict(self.server.state.stats))
+        self._reply(404, {"errors": [{"message": "not found"}]})
+
+    def do_POST(self):
+        state = self.server.state
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        state.count(requests=1)
+        if state.latency or state.jitter:
+            time.sleep(state.latency + random.uniform(0, state.jitter))
+        if state.error_rate and random.random() < state.error_rate:
+            state.count(errors=1)
+            return self._reply(503, {"errors": [{"message": "Service Unavailable"}]})
+
+        query = payload.get("query")
+        persisted = (payload.get("extensions") or {}).get("persistedQuery")
+        if persisted:
+            if not state.apq:
+                return self._reply(200, {"errors": [{"message": "PersistedQueryNotSupported",
+                                                     "extensions": {"code": "PERSISTED_QUERY_NOT_SUPPORTED"}}]})
+            digest = persisted.get("sha256Hash")
+            if query:
+                if hashlib.sha256(query.encode("utf-8")).hexdigest() != digest:
+                    return self._reply(400, {"errors": [{"message": "provided sha does not match query"}]})
+                with state.lock:
+                    state.persisted[digest] = query
+            else:
+                with state.lock:
+                    query = state.persisted.get(digest)
+                if query is None:
+                    state.count(apq_misses=1)
+                    return self._reply(200, {"errors": [{"message": "PersistedQueryNotFound",
+                                                         "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]})
+                state.count(apq_hits=1)
+        if not query:
+            return self._reply(400, {"errors": [{"message": "No query string was present"}]})
+
+        data, cost = state.execute(query, payload.get("variables") or {})
+        if cost > state.max_complexity:
+            return self._reply(200, {"errors": [{"message": f"Query has complexity of {cost}, which exceeds max complexity of {state.max_complexity}"}]})
+        accepted, remaining, retry_after = state.spend(cost)
+        if not accepted:
+            state.count(throttled=1)
+            return self._reply(429, {"errors": [{"message": "Too many requests", "extensions": {"code": "THROTTLED"}}]},
+                               {"Retry-After": f"{retry_after:.2f}", "X-RateLimit-Remaining": str(int(remaining))})
+        state.count(complexity=cost)
+        self._reply(200, {"data": data, "extensions": {"complexity": cost}}, {"X-RateLimit-Remaining": str(int(remaining))})
+
+
+def make_server(host="127.0.0.1", port=0, **options):
+    """Crée le serveur (port 0 = port libre choisi par le système) ; options : voir MockState."""
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.state = MockState(**options)
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, **options):
+    """Démarre le serveur dans un thread ; retourne (serveur, URL GraphQL)."""
+    server = make_server(host, port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/graphql"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur GraphQL local imitant l'API BrandShelter (données synthétiques)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODES, help=f"Nombre de monitorings (un toutes les 5 min depuis {_iso(NODES_START)})")
+    parser.add_argument("--accounts", type=int, default=DEFAULT_ACCOUNTS, help="Nombre de comptes (parent de n = n // 10)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence ajoutée à chaque réponse, en millisecondes")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latence aléatoire supplémentaire (0 à N ms)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Budget de complexité par minute avant 429")
+    parser.add_argument("--max-complexity", type=int, default=MAX_QUERY_COMPLEXITY, help="Complexité maximale d'une requête")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses 503 aléatoires (0 à 1)")
+    parser.add_argument("--no-apq", action="store_true", help="Refuser les persisted queries (PersistedQueryNotSupported)")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, nodes=args.nodes, accounts=args.accounts, latency=args.latency / 1000,
+                         jitter=args.jitter / 1000, budget=args.budget, max_complexity=args.max_complexity,
+                         error_rate=args.error_rate, apq=not args.no_apq)
+    print(f"🧪 Serveur GraphQL de test sur http://{args.host}:{server.server_address[1]}/graphql "
+          f"({args.nodes} monitorings, budget {args.budget}/min) — stats : GET /stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()